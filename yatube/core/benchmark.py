@@ -0,0 +1,197 @@
+"""Замер времени ответа и числа запросов к базе для всех страниц сайта.
+
+Адреса берутся из `urls.py` приложений posts, users и about, так что
+новая страница попадает в замер сама. Параметры адресов подставляются из
+данных в базе: самый обсуждаемый и самый новый пост, самый популярный
+автор, самая большая группа и самый частый тег, а поиск ищет слово из
+самого нового поста. Страницы запрашиваются тестовым клиентом от имени
+пользователя с самой длинной лентой подписок, а страницы, открытые
+только автору поста, — от имени автора.
+
+Результат — словарь, готовый к сохранению в JSON: для каждой страницы
+медиана, 95-й и 99-й процентили времени ответа в миллисекундах и число
+запросов к базе. Два таких результата сравнивает `compare`.
+"""
+import math
+import time
+from importlib import import_module
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+
+from posts.models import Comment, Follow, Group, Post, Tag, User, UserStats
+
+APPS = ('posts', 'users', 'about')
+
+# GET-параметры страниц, которым без них нечего показать.
+QUERIES = {
+    'posts:search': lambda data: {'q': data['word'][0][1]},
+    'posts:autocomplete': lambda data: {'q': data['username'][0][1][:2]},
+}
+
+# Страницы, которые открывает только автор поста `post_id`.
+AUTHOR_PAGES = ('posts:post_edit',)
+
+
+def url_names():
+    for app in APPS:
+        module = import_module(f'{app}.urls')
+        for pattern in module.urlpatterns:
+            yield (
+                f'{module.app_name}:{pattern.name}',
+                tuple(pattern.pattern.converters),
+            )
+
+
+def sample_data(user):
+    """Варианты значений параметров адресов: имя параметра — список пар
+    (название варианта, значение)."""
+    data = {}
+    hot = Post.objects.order_by('-comments_count').first()
+    fresh = Post.objects.order_by('-pub_date', '-id').first()
+    if hot is not None:
+        data['post_id'] = [('обсуждаемый', hot.pk), ('новый', fresh.pk)]
+        words = [word for word in fresh.text.split() if word.isalpha()]
+        if words:
+            data['word'] = [('из поста', max(words, key=len))]
+    popular = UserStats.objects.select_related('user').order_by(
+        '-followers_count'
+    ).first()
+    data['username'] = [('свой', user.username)]
+    if popular is not None and popular.user != user:
+        data['username'].insert(0, ('популярный', popular.user.username))
+    group = Group.objects.order_by('-posts_count').first()
+    if group is not None:
+        data['slug'] = [('большая', group.slug)]
+    tag = Tag.objects.annotate(uses=Count('entries')).order_by(
+        '-uses'
+    ).first()
+    if tag is not None:
+        data['name'] = [('частый', tag.name)]
+    return data
+
+
+def pages(data):
+    """Страницы для замера: подпись, адрес, GET-параметры и id поста,
+    от имени автора которого страницу нужно открыть, или None.
+
+    Адрес с параметром замеряется для каждого варианта его значения.
+    """
+    for name, parameters in url_names():
+        if any(parameter not in data for parameter in parameters):
+            continue
+        variants = [((), {})]
+        for parameter in parameters:
+            variants = [
+                (labels + (label,), dict(kwargs, **{parameter: value}))
+                for labels, kwargs in variants
+                for label, value in data[parameter]
+            ]
+        query = QUERIES.get(name, lambda data: {})
+        try:
+            query = query(data)
+        except KeyError:
+            continue
+        for labels, kwargs in variants:
+            try:
+                url = reverse(name, kwargs=kwargs)
+            except NoReverseMatch:
+                continue
+            label = f'{name} [{", ".join(labels)}]' if labels else name
+            as_author = kwargs['post_id'] if name in AUTHOR_PAGES else None
+            yield label, url, query, as_author
+
+
+def percentile(values, share):
+    """Процентиль `share` (от 0 до 1) отсортированного списка, ближайший
+    ранг."""
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+def measure(client, user, url, query, repeat, warmup=1):
+    timings = []
+    queries = []
+    statuses = set()
+    for number in range(warmup + repeat):
+        # Выход из аккаунта и смена пароля сбрасывают вход.
+        if client.session.get('_auth_user_id') != str(user.pk):
+            client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, query)
+            elapsed = time.perf_counter() - started
+        if number < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+    timings.sort()
+    return {
+        'url': url,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'queries': max(queries),
+    }
+
+
+def bench_user():
+    """Пользователь с самым большим числом подписок."""
+    stats = UserStats.objects.select_related('user').order_by(
+        '-following_count'
+    ).first()
+    if stats is not None:
+        return stats.user
+    return User.objects.order_by('pk').first()
+
+
+def run(repeat=20, progress=None):
+    """Замеряет все страницы на текущих данных."""
+    user = bench_user()
+    if user is None:
+        raise ValueError('В базе нет ни одного пользователя.')
+    client = Client(HTTP_HOST='localhost')
+    results = {}
+    for label, url, query, as_author in pages(sample_data(user)):
+        viewer = user
+        if as_author is not None:
+            viewer = Post.objects.select_related('author').get(
+                pk=as_author
+            ).author
+        results[label] = measure(client, viewer, url, query, repeat)
+        if progress:
+            progress(label, results[label])
+    return {
+        'posts': Post.objects.count(),
+        'users': User.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+        'repeat': repeat,
+        'pages': results,
+    }
+
+
+def compare(baseline, current, threshold=1.2, noise_ms=1.0):
+    """Страницы, которые стали медленнее в `threshold` раз (и больше чем
+    на `noise_ms`) по медиане или 95-му процентилю или стали делать
+    больше запросов: подпись, было, стало."""
+    regressions = []
+    for label, now in current['pages'].items():
+        before = baseline['pages'].get(label)
+        if before is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if (
+                now[key] > before[key] * threshold
+                and now[key] - before[key] > noise_ms
+            ):
+                regressions.append((f'{label} {key}', before[key], now[key]))
+        if now['queries'] > before['queries']:
+            regressions.append(
+                (f'{label} queries', before['queries'], now['queries'])
+            )
+    return regressions
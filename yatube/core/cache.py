@@ -0,0 +1,266 @@
+"""Кэш в файле SQLite, общий для всех процессов WSGI на одном хосте.
+
+Локальная замена memcached/Redis: фрагменты и счётчики поколений, которые
+записал один воркер, сразу видны остальным, а память не дублируется.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+'''
+
+# Как часто (в записях) проверять, не пора ли вытеснять старые ключи.
+CULL_CHECK_INTERVAL = 100
+
+# Не чаще какого интервала (в секундах) чтение обновляет время доступа.
+ACCESS_INTERVAL = 60
+
+
+class SQLiteCache(BaseCache):
+    """Кэш с LRU-вытеснением по числу записей и суммарному размеру.
+
+    Целые числа хранятся как INTEGER, поэтому `incr` выполняется одним
+    UPDATE и атомарен между процессами. Остальные значения — pickle.
+
+    Параметры в OPTIONS: MAX_ENTRIES, CULL_FREQUENCY (как у встроенных
+    бэкендов), MAX_SIZE — предел суммарного размера значений в байтах и
+    ACCESS_INTERVAL. Запись блокирует файл для всех процессов, поэтому
+    чтение обновляет время доступа, только если оно старше
+    ACCESS_INTERVAL секунд: порядок вытеснения точен до этого интервала.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._access_interval = float(
+            options.get('ACCESS_INTERVAL', ACCESS_INTERVAL)
+        )
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            local.db = db
+            local.pid = os.getpid()
+        return local.db
+
+    def _encode(self, value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, self.pickle_protocol))
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    @staticmethod
+    def _size(value):
+        return 8 if isinstance(value, int) else len(value)
+
+    def _write(self, key, value, timeout, replace=True):
+        encoded = self._encode(value)
+        verb = 'REPLACE' if replace else 'IGNORE'
+        cursor = self._db.execute(
+            f'INSERT OR {verb} INTO cache '
+            '(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+            (key, encoded, self.get_backend_timeout(timeout), time.time(),
+             self._size(encoded)),
+        )
+        self._writes += 1
+        if self._writes % CULL_CHECK_INTERVAL == 0:
+            self._cull()
+        return cursor.rowcount == 1
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._delete_expired(key)
+        return self._write(key, value, timeout, replace=False)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self.set(key, value, timeout, version)
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return []
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        found = self._fetch([key])
+        return found.get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        found = self._fetch(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def _fetch(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        marks = ', '.join('?' * len(keys))
+        db = self._db
+        rows = db.execute(
+            f'SELECT key, value, accessed FROM cache WHERE key IN ({marks}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*keys, now),
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed >= self._access_interval
+        ]
+        if stale:
+            db.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(stale))})',
+                (now, *stale),
+            )
+        return {key: self._decode(value) for key, value, _ in rows}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), time.time(), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.execute(
+                'UPDATE cache SET value = value + ?, accessed = ? '
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, time.time(), key, time.time()),
+            )
+            if cursor.rowcount != 1:
+                raise ValueError("Key '%s' not found" % key)
+            value = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            marks = ', '.join('?' * len(keys))
+            self._db.execute(
+                f'DELETE FROM cache WHERE key IN ({marks})', keys
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _delete_expired(self, key):
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ? AND expires <= ?',
+            (key, time.time()),
+        )
+
+    def _cull(self):
+        """Удаляет просроченное, затем самые давно читанные записи."""
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        entries, size = db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        victims = max(
+            entries // self._cull_frequency,
+            entries - self._max_entries,
+            1,
+        )
+        db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (victims,),
+        )
+        # Если лимит по объёму всё ещё превышен, вытесняем дальше.
+        while db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache'
+        ).fetchone()[0] > self._max_size:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (victims,),
+            )
+
+    def close(self, **kwargs):
+        # Соединения живут весь срок процесса: открывать файл на каждый
+        # запрос дороже, чем держать его открытым.
+        pass
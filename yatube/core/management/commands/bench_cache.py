@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'bench'),
+    'sqlite': ('core.cache.SQLiteCache', None),
+}
+
+
+def make_cache(name, directory):
+    path, location = BACKENDS[name]
+    if location is None:
+        location = os.path.join(directory, 'bench-cache.sqlite3')
+    return import_string(path)(location, {
+        'OPTIONS': {'MAX_ENTRIES': 1000000},
+    })
+
+
+def _incr_worker(name, directory, count):
+    cache = make_cache(name, directory)
+    for _ in range(count):
+        cache.incr('shared-counter')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость LocMemCache и общего SQLite-кэша и проверяет, '
+        'видят ли процессы записи друг друга.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        ops = options['ops']
+        with tempfile.TemporaryDirectory() as directory:
+            for name in BACKENDS:
+                cache = make_cache(name, directory)
+                cache.clear()
+                self.report(name, 'set', ops, self.time(
+                    lambda i: cache.set(f'key:{i}', 'x' * 512), ops
+                ))
+                self.report(name, 'get', ops, self.time(
+                    lambda i: cache.get(f'key:{i}'), ops
+                ))
+                keys = [f'key:{i}' for i in range(10)]
+                self.report(name, 'get_many(10)', ops // 10, self.time(
+                    lambda i: cache.get_many(keys), ops // 10
+                ))
+                cache.set('counter', 0)
+                self.report(name, 'incr', ops, self.time(
+                    lambda i: cache.incr('counter'), ops
+                ))
+                self.check_sharing(name, cache, directory, ops // 10,
+                                   options['processes'])
+
+    @staticmethod
+    def time(operation, count):
+        started = time.perf_counter()
+        for number in range(count):
+            operation(number)
+        return time.perf_counter() - started
+
+    def report(self, name, operation, count, seconds):
+        self.stdout.write(
+            f'{name:7} {operation:13} {count / seconds:12.0f} оп/с '
+            f'{seconds / count * 1e6:9.1f} мкс/оп'
+        )
+
+    def check_sharing(self, name, cache, directory, count, processes):
+        cache.set('shared-counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=_incr_worker, args=(name, directory, count)
+            )
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seen = cache.get('shared-counter')
+        self.stdout.write(
+            f'{name:7} {processes} процессов × {count} incr: '
+            f'родитель видит {seen} из {processes * count}'
+        )
@@ -0,0 +1,133 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from core import benchmark
+from posts.models import Post
+from posts.seeding import Seeder
+
+
+# Кэш на время замера: страницы не должны попадать в готовые фрагменты
+# прошлых запусков, а сбрасывать настоящий кэш сайта ради этого нельзя.
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-views',
+    },
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def load_baseline(path):
+    """Прошлый результат из файла `path`."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError) as error:
+        raise CommandError(error)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число запросов всех страниц posts, users '
+        'и about и пишет результат в JSON. С --sizes сначала дополняет '
+        'базу синтетическими постами до каждого объёма. Все изменения '
+        'откатываются, страницы работают с отдельным пустым кэшем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=None,
+            help='Объёмы постов, например 10000 100000 1000000.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для результата, по умолчанию стандартный вывод.',
+        )
+        parser.add_argument(
+            '--compare', default=None,
+            help='Прошлый результат, с которым сравнить замер.',
+        )
+        parser.add_argument('--threshold', type=float, default=1.2)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            baseline = load_baseline(options['compare'])
+        runs = self.measure(options)
+        self.write_report(runs, options['output'])
+        if baseline is not None:
+            self.compare(baseline, runs, options['threshold'])
+
+    def measure(self, options):
+        """Замеры на каждом объёме; данные затем откатываются."""
+        progress = self.progress if options['verbosity'] > 1 else None
+        settings = override_settings(DEBUG=False, CACHES=BENCH_CACHES)
+        runs = []
+        try:
+            with settings, transaction.atomic():
+                for size in options['sizes'] or [None]:
+                    if size is not None:
+                        self.grow(size, options['seed'])
+                    runs.append(
+                        benchmark.run(options['repeat'], progress=progress)
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        except ValueError as error:
+            raise CommandError(error)
+        return runs
+
+    def write_report(self, runs, output):
+        report = json.dumps(
+            {'runs': runs}, ensure_ascii=False, indent=2, sort_keys=True
+        )
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def grow(self, size, seed):
+        missing = size - Post.objects.count()
+        if missing <= 0:
+            return
+        self.stderr.write(f'Дополняю базу до {size} постов...')
+        Seeder(seed=seed + size).run(
+            users=max(1, missing // 10), posts=missing
+        )
+
+    def compare(self, baseline, runs, threshold):
+        before_runs = {run['posts']: run for run in baseline.get('runs', [])}
+        for run in runs:
+            before = before_runs.get(run['posts'])
+            if before is None and len(runs) == len(before_runs) == 1:
+                before = next(iter(before_runs.values()))
+            if before is None:
+                self.stderr.write(
+                    f'Нет прошлого замера для {run["posts"]} постов.'
+                )
+                continue
+            regressions = benchmark.compare(before, run, threshold)
+            for label, was, now in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f'{run["posts"]} постов, {label}: {was} → {now}'
+                ))
+            if not regressions:
+                self.stderr.write(self.style.SUCCESS(
+                    f'{run["posts"]} постов: без ухудшений.'
+                ))
+
+    def progress(self, label, result):
+        self.stderr.write(
+            f'{label}: p50 {result["p50_ms"]} мс, '
+            f'p95 {result["p95_ms"]} мс, запросов {result["queries"]}'
+        )
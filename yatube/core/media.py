@@ -0,0 +1,169 @@
+"""Отдача файлов из MEDIA_ROOT в боевом режиме.
+
+В отличие от `django.views.static.serve` файл не читается в память:
+`FileResponse` отдаёт его через `wsgi.file_wrapper` (sendfile, если его
+умеет сервер), поддерживаются запросы диапазонов и условные запросы по
+сильному ETag. Если перед приложением стоит nginx или Apache, можно
+включить MEDIA_ACCEL, и тогда воркер отдаёт только заголовки, а сам файл
+отправляет веб-сервер.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+# Файлы, имя которых — хеш содержимого: миниатюры sorl-thumbnail и
+# картинки постов из хранилища с адресацией по содержимому.
+IMMUTABLE_PATH = re.compile(
+    r'^(cache/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}'
+    r'|posts/[0-9a-f]{2}/[0-9a-f]{64})\.\w+$'
+)
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class RangeFile:
+    """Читает из открытого файла не больше `length` байт с `start`.
+
+    Без `fileno`, поэтому сервер не попытается отправить через sendfile
+    весь остаток файла.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Диапазон (начало, конец включительно) из заголовка Range.
+
+    None — заголовка нет или он не поддерживается (несколько диапазонов),
+    и нужно отдать файл целиком; ValueError — диапазон за концом файла.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def file_etag(stat_result):
+    return '"%x-%x"' % (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def cache_control(path):
+    if IMMUTABLE_PATH.match(path):
+        return IMMUTABLE_CACHE_CONTROL
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def accel_response(path, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + path
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def file_response(request, full_path, size, etag, content_type):
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and (
+        if_range is None or etag in parse_etags(if_range)
+    ):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.block_size = settings.MEDIA_BLOCK_SIZE
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+
+    etag = file_etag(stat_result)
+    size = stat_result.st_size
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(stat_result.st_mtime)
+    )
+    if conditional is not None:
+        response = conditional
+    elif settings.MEDIA_ACCEL:
+        response = accel_response(path, full_path, content_type)
+    else:
+        response = file_response(request, full_path, size, etag,
+                                 content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat_result.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,60 @@
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _report(label, queries, limit):
+    statements = '\n'.join(
+        f'{number}. {query["sql"]}'
+        for number, query in enumerate(queries.captured_queries, start=1)
+    )
+    return (
+        f'{label}: выполнено {len(queries)} запросов к базе, '
+        f'допустимо не больше {limit}.\n{statements}'
+    )
+
+
+@contextmanager
+def query_budget(limit, label='Блок кода'):
+    """Падает, если внутри блока выполнено больше `limit` запросов."""
+    with CaptureQueriesContext(connection) as queries:
+        yield queries
+    if len(queries) > limit:
+        raise QueryBudgetExceeded(_report(label, queries, limit))
+
+
+class QueryBudgetMiddleware:
+    """В режиме отладки проверяет, что страница укладывается в бюджет
+    запросов из `settings.QUERY_BUDGETS` для своего имени URL.
+
+    Превышение пишется в лог, а при `QUERY_BUDGET_STRICT` (в тестах)
+    приводит к исключению.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DEBUG:
+            return self.get_response(request)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        limit = settings.QUERY_BUDGETS.get(match.view_name)
+        if limit is not None and len(queries) > limit:
+            report = _report(match.view_name, queries, limit)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        return response
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import benchmark
+from posts.models import Follow, Post
+from posts.seeding import Seeder
+
+
+class BenchViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Seeder().run(users=20, posts=100)
+
+    def test_measures_every_page(self):
+        result = benchmark.run(repeat=2)
+        self.assertEqual(result['posts'], 100)
+        names = {label.split(' [')[0] for label in result['pages']}
+        self.assertEqual(names, {name for name, _ in benchmark.url_names()})
+        for label, page in result['pages'].items():
+            with self.subTest(label=label):
+                self.assertLessEqual(page['p50_ms'], page['p95_ms'])
+                self.assertLessEqual(page['p95_ms'], page['p99_ms'])
+                self.assertTrue(all(
+                    status < 500 for status in page['status']
+                ))
+        self.assertEqual(
+            result['pages']['about:author']['status'], [200]
+        )
+        for label, page in result['pages'].items():
+            if label.startswith('posts:post_edit'):
+                self.assertEqual(page['status'], [200])
+
+    def test_search_gets_a_real_query(self):
+        data = benchmark.sample_data(benchmark.bench_user())
+        (query,) = [
+            query for label, _, query, _ in benchmark.pages(data)
+            if label == 'posts:search'
+        ]
+        self.assertTrue(
+            Post.objects.filter(text__contains=query['q']).exists()
+        )
+
+    def test_compare_reports_regressions(self):
+        before = {'pages': {'posts:index': {
+            'p50_ms': 10, 'p95_ms': 20, 'queries': 3,
+        }}}
+        after = {'pages': {'posts:index': {
+            'p50_ms': 10.5, 'p95_ms': 40, 'queries': 4,
+        }}}
+        self.assertEqual(benchmark.compare(before, after), [
+            ('posts:index p95_ms', 20, 40),
+            ('posts:index queries', 3, 4),
+        ])
+
+    def test_command_grows_data_and_rolls_back(self):
+        follows = Follow.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_views', sizes=[100, 150], repeat=1, output=path,
+                stderr=StringIO(),
+            )
+            with open(path, encoding='utf-8') as file:
+                runs = json.load(file)['runs']
+        self.assertEqual([run['posts'] for run in runs], [100, 150])
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), follows)
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def _incr_many(path, count):
+    cache = SQLiteCache(path, {})
+    for _ in range(count):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_set_get_delete(self):
+        self.cache.set('post', {'text': 'Текст'})
+        self.assertEqual(self.cache.get('post'), {'text': 'Текст'})
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+        self.assertEqual(self.cache.get('post', 'нет'), 'нет')
+
+    def test_get_many(self):
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'два'}
+        )
+
+    def test_add_keeps_existing_value(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_expiry(self):
+        self.cache.set('short', 'value', timeout=0.05)
+        self.assertTrue(self.cache.has_key('short'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'again'))
+
+    def test_incr(self):
+        self.cache.set('counter', 5)
+        self.assertEqual(self.cache.incr('counter', 3), 8)
+        self.assertEqual(self.cache.decr('counter'), 7)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_incr_many, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_values_shared_between_instances(self):
+        self.cache.set('shared', 'из первого воркера')
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(other.get('shared'), 'из первого воркера')
+
+    def test_cull_evicts_least_recently_used(self):
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {
+                'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2, 'ACCESS_INTERVAL': 0,
+            },
+        })
+        cache.set('hot', 'value')
+        for number in range(99):
+            cache.get('hot')
+            cache.set(f'cold:{number}', number)
+        self.assertEqual(cache.get('hot'), 'value')
+        self.assertIsNone(cache.get('cold:0'))
+
+    def test_reads_refresh_access_time_lazily(self):
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {'ACCESS_INTERVAL': 0.05},
+        })
+        cache.set('key', 'value')
+
+        def accessed():
+            return cache._db.execute(
+                "SELECT accessed FROM cache WHERE key = ':1:key'"
+            ).fetchone()[0]
+
+        written = accessed()
+        cache.get('key')
+        self.assertEqual(accessed(), written)
+        time.sleep(0.1)
+        cache.get_many(['key'])
+        self.assertGreater(accessed(), written)
+
+    def test_cull_respects_max_size(self):
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_SIZE': 10000, 'MAX_ENTRIES': 1000},
+        })
+        for number in range(100):
+            cache.set(f'big:{number}', 'x' * 1000)
+        size = cache._db.execute('SELECT SUM(size) FROM cache').fetchone()[0]
+        self.assertLessEqual(size, 10000)
+        self.assertIsNotNone(cache.get('big:99'))
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group
 
 
@@ -10,6 +11,20 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поле text оставлено в search_fields, чтобы в списке было поле
+        # поиска, но ищет по нему индекс FTS5, а не LIKE по всей таблице.
+        if not search.supported() or not search.match_expression(
+            search_term
+        ):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        queryset = queryset.filter(
+            pk__in=search.matching_post_ids(search_term)
+        )
+        return queryset, False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
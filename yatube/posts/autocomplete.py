@@ -0,0 +1,196 @@
+"""Подсказки авторов и групп по началу слова без запросов к базе.
+
+Индекс живёт в памяти процесса: отсортированный список ключей, в котором
+префикс ищется через `bisect`. Он строится при первом обращении двумя
+запросами, дальше его обновляют сигналы сохранения и удаления
+пользователей и групп. Изменения, сделанные другими процессами, индекс
+увидит после перестройки, которая происходит не чаще раза в
+AUTOCOMPLETE_REBUILD_INTERVAL секунд. Перестраивает индекс один поток,
+остальные тем временем ищут по старому.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models import Group, User
+
+USER = 'user'
+GROUP = 'group'
+
+
+def fold(text):
+    return text.lower().replace('ё', 'е')
+
+
+def keys(*texts):
+    """Ключи для поиска с начала каждого слова каждого текста."""
+    found = set()
+    for text in texts:
+        text = ' '.join(fold(text).split())
+        if not text:
+            continue
+        found.add(text)
+        position = text.find(' ')
+        while position != -1:
+            found.add(text[position + 1:])
+            position = text.find(' ', position + 1)
+    return found
+
+
+def user_entry(user):
+    full_name = user.get_full_name()
+    label = f'{full_name} (@{user.username})' if full_name else user.username
+    return (
+        (USER, user.pk),
+        (label, user.username),
+        keys(user.username, full_name),
+    )
+
+
+def group_entry(group):
+    return (
+        (GROUP, group.pk),
+        (group.title, group.slug),
+        keys(group.slug, group.title),
+    )
+
+
+class PrefixIndex:
+    """Отсортированный список `(ключ, вид, id)` и описания записей.
+
+    Запись добавляется под несколькими ключами; поиск отдаёт каждую не
+    больше одного раза в порядке ключей.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._keys = []
+        self._items = {}
+        self.built_at = None
+
+    def _add(self, item, value, item_keys):
+        self._remove(item)
+        self._items[item] = (value, item_keys)
+        for key in item_keys:
+            insort(self._keys, (key, *item))
+
+    def _remove(self, item):
+        old = self._items.pop(item, None)
+        if old is None:
+            return
+        for key in old[1]:
+            position = bisect_left(self._keys, (key, *item))
+            if self._keys[position:position + 1] == [(key, *item)]:
+                del self._keys[position]
+
+    def add(self, item, value, item_keys):
+        with self._lock:
+            if self.built_at is not None:
+                self._add(item, value, item_keys)
+
+    def remove(self, item):
+        with self._lock:
+            if self.built_at is not None:
+                self._remove(item)
+
+    def build(self, entries):
+        """Заполняет индекс целиком; поиск до конца сборки видит старый."""
+        items = {}
+        index_keys = []
+        for item, value, item_keys in entries:
+            items[item] = (value, item_keys)
+            index_keys.extend((key, *item) for key in item_keys)
+        index_keys.sort()
+        with self._lock:
+            self._keys, self._items = index_keys, items
+            self.built_at = time.monotonic()
+
+    def refresh(self, load):
+        """Перестраивает устаревший индекс записями из `load()`.
+
+        Пока индекса нет, ждут все; устаревший перестраивает первый
+        пришедший поток, а остальные сразу возвращаются к старому.
+        """
+        if not self.stale():
+            return
+        blocking = self.built_at is None
+        if not self._rebuild_lock.acquire(blocking=blocking):
+            return
+        try:
+            # Пока поток ждал, индекс мог перестроить другой.
+            if self.stale():
+                self.build(load())
+        finally:
+            self._rebuild_lock.release()
+
+    def reset(self):
+        with self._lock:
+            self._keys, self._items = [], {}
+            self.built_at = None
+
+    def stale(self):
+        return self.built_at is None or (
+            time.monotonic() - self.built_at
+            > settings.AUTOCOMPLETE_REBUILD_INTERVAL
+        )
+
+    def search(self, prefix, limit):
+        """До `limit` пар (вид, значение) для записей с ключом на `prefix`."""
+        prefix = ' '.join(fold(prefix).split())
+        if not prefix:
+            return []
+        index_keys, items = self._keys, self._items
+        found = {}
+        position = bisect_left(index_keys, (prefix,))
+        while position < len(index_keys) and len(found) < limit:
+            key, *item = index_keys[position]
+            if not key.startswith(prefix):
+                break
+            item = tuple(item)
+            if item not in found and item in items:
+                found[item] = items[item][0]
+            position += 1
+        return [(kind, value) for (kind, _), value in found.items()]
+
+
+index = PrefixIndex()
+
+
+def entries():
+    for user in User.objects.only(
+        'pk', 'username', 'first_name', 'last_name'
+    ).iterator():
+        yield user_entry(user)
+    for group in Group.objects.only('pk', 'slug', 'title').iterator():
+        yield group_entry(group)
+
+
+def suggest(prefix, limit=None):
+    """Подсказки для `prefix`: словари с видом, подписью и адресом."""
+    index.refresh(entries)
+    results = []
+    for kind, (label, slug) in index.search(
+        prefix, limit or settings.AUTOCOMPLETE_LIMIT
+    ):
+        if kind == USER:
+            url = reverse('posts:profile', args=(slug,))
+        else:
+            url = reverse('posts:group_list', args=(slug,))
+        results.append({'type': kind, 'label': label, 'url': url})
+    return results
+
+
+def user_saved(user):
+    index.add(*user_entry(user))
+
+
+def group_saved(group):
+    index.add(*group_entry(group))
+
+
+def removed(kind, pk):
+    index.remove((kind, pk))
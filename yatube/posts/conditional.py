@@ -0,0 +1,65 @@
+import hashlib
+from datetime import date
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from . import trending
+from .fragments import feed_version, recommendations_version
+from .models import Comment, Group, Post, User
+
+
+def _etag(request, *parts):
+    """Хэш от состояния страницы, зрителя и параметров запроса."""
+    parts = (
+        request.user.pk,
+        request.GET.urlencode(),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        date.today().year,
+    ) + parts
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, feed_version(), trending.computed_at())
+
+
+def group_etag(request, slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'title', 'description', 'posts_count'
+    ).first()
+    if group is None:
+        return None
+    return _etag(request, feed_version(), *group)
+
+
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'first_name', 'last_name',
+        'stats__posts_count', 'stats__followers_count',
+    ).first()
+    if author is None:
+        return None
+    if not request.user.is_authenticated:
+        return _etag(request, feed_version(), *author)
+    return _etag(
+        request, feed_version(request.user), recommendations_version(),
+        *author
+    )
+
+
+def post_detail_etag(request, post_id):
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-created').values('created')[:1]
+    post = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list(
+        'comments_count', 'last_comment', 'group__slug',
+        'author__first_name', 'author__last_name',
+        'author__stats__posts_count',
+    ).first()
+    if post is None:
+        return None
+    return _etag(request, feed_version(), *post)
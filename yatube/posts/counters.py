@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Comment, Follow, Group, Post, StoredImage, User, UserStats
+)
+
+
+def _shift(queryset, field, delta):
+    """Атомарно сдвигает счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{field + '__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    if user_id is None:
+        return
+    queryset = UserStats.objects.filter(user_id=user_id)
+    if _shift(queryset, field, delta) or delta < 0:
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    _shift(queryset, field, delta)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_comments(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def user_stats(user):
+    """Счётчики пользователя; для тех, у кого их ещё нет, — нулевые.
+
+    Если связь загружена через `select_related('stats')`, запроса нет.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _count(queryset, group_by):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_by: OuterRef('pk')})
+            .order_by()
+            .values(group_by)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def rebuild():
+    """Пересчитывает все счётчики по данным в базе."""
+    with transaction.atomic():
+        UserStats.objects.bulk_create(
+            (
+                UserStats(user_id=user_id)
+                for user_id in User.objects.filter(
+                    stats__isnull=True
+                ).values_list('pk', flat=True)
+            ),
+            ignore_conflicts=True,
+        )
+        UserStats.objects.update(
+            posts_count=_count(Post.objects.all(), 'author'),
+            followers_count=_count(Follow.objects.all(), 'author'),
+            following_count=_count(Follow.objects.all(), 'user'),
+        )
+        Group.objects.update(posts_count=_count(Post.objects.all(), 'group'))
+        Post.objects.update(
+            comments_count=_count(Comment.objects.all(), 'post')
+        )
+        StoredImage.objects.all().delete()
+        StoredImage.objects.bulk_create(
+            StoredImage(name=row['image'], refs=row['refs'])
+            for row in Post.objects.exclude(image='')
+            .order_by()
+            .values('image')
+            .annotate(refs=Count('pk'))
+        )
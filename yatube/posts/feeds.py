@@ -0,0 +1,190 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginators import CursorPaginator
+
+PULL_AUTHORS_CACHE_KEY = 'posts:feed:pull_authors'
+FANOUT_BATCH_SIZE = 1000
+
+# Последние FEED_BACKFILL_SIZE постов каждого автора для всех его
+# подписчиков, кроме авторов, чьи посты подмешиваются при чтении.
+REBUILD_SQL = '''
+{insert} posts_feedentry (user_id, post_id, pub_date)
+SELECT follow.user_id, latest.id, latest.pub_date
+FROM posts_follow follow
+JOIN (
+    SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+        PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+    ) AS position
+    FROM posts_post
+) latest
+ON latest.author_id = follow.author_id AND latest.position <= %s
+WHERE follow.author_id NOT IN (
+    SELECT user_id FROM posts_userstats WHERE followers_count > %s
+)
+{suffix}
+'''
+
+# То же для одного автора, который перестал быть «подмешиваемым».
+AUTHOR_FILL_SQL = '''
+{insert} posts_feedentry (user_id, post_id, pub_date)
+SELECT follow.user_id, latest.id, latest.pub_date
+FROM posts_follow follow
+JOIN (
+    SELECT id, pub_date FROM posts_post
+    WHERE author_id = %s
+    ORDER BY pub_date DESC, id DESC
+    LIMIT %s
+) latest
+WHERE follow.author_id = %s
+{suffix}
+'''
+
+
+def pull_author_ids():
+    """Авторы, чьи посты подмешиваются в ленты при чтении."""
+    author_ids = cache.get(PULL_AUTHORS_CACHE_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            UserStats.objects.filter(
+                followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(
+            PULL_AUTHORS_CACHE_KEY,
+            author_ids,
+            settings.FEED_PULL_AUTHORS_TIMEOUT,
+        )
+    return author_ids
+
+
+def _bulk_add(entries):
+    """Вставляет записи пачками, не держа в памяти всю раскладку."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in pull_author_ids():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    if author_id in pull_author_ids():
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+
+
+def rebuild_feeds():
+    """Заполняет ленты всех подписчиков так, будто каждая подписка прошла
+    через `backfill_feed`. Работает одним запросом; уже записанное
+    пропускается."""
+    _execute(
+        REBUILD_SQL,
+        [settings.FEED_BACKFILL_SIZE, settings.FEED_FANOUT_MAX_FOLLOWERS],
+    )
+    cache.delete(PULL_AUTHORS_CACHE_KEY)
+
+
+def _execute(sql, params):
+    insert = connection.ops.insert_statement(ignore_conflicts=True)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(insert=insert, suffix=suffix), params)
+
+
+def author_unfollowed(author_id):
+    """Раскладывает посты автора по лентам, если после отписки он вышел
+    из числа подмешиваемых: новые посты таких авторов в ленты не
+    попадали, а читать их напрямую лента больше не будет."""
+    if author_id not in pull_author_ids():
+        return
+    if UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists():
+        return
+    _execute(
+        AUTHOR_FILL_SQL,
+        [author_id, settings.FEED_BACKFILL_SIZE, author_id],
+    )
+    cache.delete(PULL_AUTHORS_CACHE_KEY)
+
+
+def clear_feed(user_id, author_id):
+    """Убирает из ленты бывшего подписчика посты автора."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def post_key(post):
+    return [post.pub_date, post.pk]
+
+
+class FollowFeedPaginator(CursorPaginator):
+    """Лента подписок: диапазон по `FeedEntry` пользователя плюс, если он
+    подписан на очень популярных авторов, их посты, прочитанные напрямую.
+    """
+
+    def __init__(self, user, per_page):
+        entries = FeedEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        )
+        super().__init__(
+            entries, per_page, ordering=('-pub_date', '-post_id'),
+            key=post_key,
+        )
+        self.pulled = None
+        pull_ids = pull_author_ids()
+        if pull_ids:
+            followed = list(Follow.objects.filter(
+                user=user, author_id__in=pull_ids
+            ).values_list('author_id', flat=True))
+            if followed:
+                self.pulled = Post.objects.filter(
+                    author_id__in=followed
+                ).select_related('author', 'group')
+
+    def _fetch(self, values, reverse):
+        items = [
+            entry.post
+            for entry in self.fetch(
+                self.object_list, self.ordering, values, reverse
+            )
+        ]
+        if self.pulled is None:
+            return items
+        seen = {post.pk for post in items}
+        items.extend(
+            post
+            for post in self.fetch(
+                self.pulled, ('-pub_date', '-id'), values, reverse
+            )
+            if post.pk not in seen
+        )
+        items.sort(key=post_key, reverse=not reverse)
+        return items[:self.per_page + 1]
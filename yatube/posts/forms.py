@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from posts.models import Post, Comment
+from posts.uploads import RejectedUpload, normalize_image
 
 
 class PostForm(forms.ModelForm):
@@ -18,6 +20,27 @@ class PostForm(forms.ModelForm):
             'image': 'Картинка'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Отклонённую при загрузке картинку поле не должно пытаться
+        # открыть: причину отказа показывает clean_image.
+        self.upload_errors = {
+            name: upload.error for name, upload in self.files.items()
+            if isinstance(upload, RejectedUpload)
+        }
+        if self.upload_errors:
+            self.files = self.files.copy()
+            for name in self.upload_errors:
+                del self.files[name]
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            image = normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,62 @@
+import time
+
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = 'posts:feed:generation'
+USER_GENERATION_KEY = 'posts:feed:generation:{}'
+RECOMMENDATIONS_GENERATION_KEY = 'posts:recommendations:generation'
+
+
+def _fresh_generation():
+    # Если ключ вытеснен из кэша, счёт продолжается с текущего времени,
+    # чтобы не совпасть со старыми ещё живыми фрагментами.
+    return int(time.time() * 1000)
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_generation(), None)
+
+
+def bump_feed_generation():
+    """Инвалидирует фрагменты всех лент после изменения поста."""
+    bump_generation(FEED_GENERATION_KEY)
+
+
+def bump_user_generation(user_id):
+    """Инвалидирует фрагменты ленты подписок одного пользователя."""
+    bump_generation(USER_GENERATION_KEY.format(user_id))
+
+
+def bump_recommendations_generation():
+    """Инвалидирует страницы с рекомендациями после их пересчёта."""
+    bump_generation(RECOMMENDATIONS_GENERATION_KEY)
+
+
+def _generations(keys):
+    values = cache.get_many(keys)
+    missing = {key: _fresh_generation() for key in keys if key not in values}
+    if missing:
+        cache.set_many(missing, None)
+        values.update(missing)
+    return '.'.join(str(values[key]) for key in keys)
+
+
+def feed_version(user=None):
+    """Версия для ключа фрагментного кэша ленты.
+
+    Общая лента зависит только от поколения постов, лента подписок —
+    ещё и от поколения подписок конкретного пользователя.
+    """
+    keys = [FEED_GENERATION_KEY]
+    if user is not None:
+        keys.append(USER_GENERATION_KEY.format(user.pk))
+    return _generations(keys)
+
+
+def recommendations_version():
+    """Версия таблицы рекомендаций для ETag страниц, которые их
+    показывают."""
+    return _generations([RECOMMENDATIONS_GENERATION_KEY])
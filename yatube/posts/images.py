@@ -0,0 +1,127 @@
+"""Учёт ссылок постов на файлы картинок и их метаданные.
+
+Одинаковые картинки хранятся одним файлом (см. `posts.storage`), поэтому
+файл можно удалить, только когда на него не ссылается ни один пост.
+Размеры, объём и формат картинки хранятся в полях поста, чтобы для
+вёрстки не открывать файлы.
+"""
+import logging
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F
+from PIL import Image
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post, StoredImage
+
+logger = logging.getLogger(__name__)
+
+image_storage = Post._meta.get_field('image').storage
+
+
+def retain(name):
+    """Добавляет ссылку поста на файл картинки."""
+    if not name:
+        return
+    if StoredImage.objects.filter(name=name).update(refs=F('refs') + 1):
+        return
+    _, created = StoredImage.objects.get_or_create(
+        name=name, defaults={'refs': 1}
+    )
+    if not created:
+        StoredImage.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Убирает ссылку поста на файл.
+
+    Файл без ссылок удаляется вместе с миниатюрами после фиксации
+    транзакции.
+    """
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1
+    )
+    transaction.on_commit(lambda: delete_unused(name))
+
+
+def delete_unused(name):
+    deleted, _ = StoredImage.objects.filter(name=name, refs=0).delete()
+    if not deleted:
+        return
+    try:
+        delete_with_thumbnails(ImageFile(name, image_storage))
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Не удалось удалить картинку %s', name, exc_info=True)
+
+
+META_FIELDS = ('image_width', 'image_height', 'image_size', 'image_format')
+
+
+def empty_meta(size=None):
+    return dict(zip(META_FIELDS, (None, None, size, '')))
+
+
+def image_meta(file, size):
+    """Метаданные картинки по заголовку открытого файла, без декодирования.
+
+    Если картинку не удалось прочитать, размеры пустые.
+    """
+    meta = empty_meta(size)
+    try:
+        with Image.open(file) as image:
+            meta.update(
+                image_width=image.width,
+                image_height=image.height,
+                image_format=image.format or '',
+            )
+    except (OSError, Image.DecompressionBombError):
+        pass
+    return meta
+
+
+def meta_from_path(path):
+    """Метаданные файла на диске; у отсутствующего файла объём 0."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return empty_meta(0)
+    with open(path, 'rb') as file:
+        return image_meta(file, size)
+
+
+def has_usable_file(post):
+    """Есть ли у картинки поста читаемый файл, судя по метаданным.
+
+    Объём 0 означает, что файла нет, а объём без размеров — что картинку
+    не удалось прочитать. Пока метаданные не заполнены, файл считается
+    читаемым.
+    """
+    if post.image_size is None:
+        return True
+    return post.image_size > 0 and post.image_width is not None
+
+
+def fill_meta(post):
+    """Заполняет поля метаданных по картинке поста.
+
+    Только что загруженная картинка читается из загрузки, ещё до записи
+    в хранилище, остальные — с диска.
+    """
+    image = post.image
+    if not image:
+        meta = empty_meta()
+    elif not image._committed:
+        meta = image_meta(image.file, image.file.size)
+        image.file.seek(0)
+    else:
+        try:
+            meta = meta_from_path(image_storage.path(image.name))
+        except SuspiciousFileOperation:
+            meta = empty_meta(0)
+    for field, value in meta.items():
+        setattr(post, field, value)
@@ -0,0 +1,69 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+
+from posts.images import (
+    META_FIELDS, empty_meta, image_storage, meta_from_path
+)
+from posts.models import Post
+
+
+def read(job):
+    pk, path = job
+    if path is None:
+        return pk, empty_meta(0)
+    return pk, meta_from_path(path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, объём и формат картинок у постов, где их ещё '
+        'нет. Файлы читает пул процессов; прерванный запуск можно '
+        'повторить, он продолжит с необработанных постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').filter(
+            image_size__isnull=True
+        ).order_by('pk')
+        total = pending.count()
+        done = 0
+        last_pk = 0
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], mp_context=context
+        ) as pool:
+            while True:
+                chunk = list(
+                    pending.filter(pk__gt=last_pk)
+                    .only('pk', 'image')[:options['chunk']]
+                )
+                if not chunk:
+                    break
+                last_pk = chunk[-1].pk
+                by_pk = {post.pk: post for post in chunk}
+                jobs = [
+                    (post.pk, self.path(post.image.name)) for post in chunk
+                ]
+                for pk, meta in pool.map(read, jobs):
+                    for field, value in meta.items():
+                        setattr(by_pk[pk], field, value)
+                Post.objects.bulk_update(chunk, META_FIELDS)
+                done += len(chunk)
+                self.stdout.write(f'{done}/{total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Метаданные заполнены у {done} постов.'
+        ))
+
+    @staticmethod
+    def path(name):
+        try:
+            return image_storage.path(name)
+        except SuspiciousFileOperation:
+            return None
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Post
+from posts.tags import index_sources
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает хештеги и упоминания в уже существующих постах и '
+        'комментариях. Тексты читаются пачками по возрастанию id; '
+        'повторный запуск пропускает уже записанное.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        posts = self.backfill(
+            Post.objects.values_list('pk', 'pub_date', 'text'),
+            lambda pk, pub_date, text: (pk, None, pub_date, text),
+            options['chunk'],
+        )
+        comments = self.backfill(
+            Comment.objects.values_list('pk', 'post_id', 'created', 'text'),
+            lambda pk, post_id, created, text: (post_id, pk, created, text),
+            options['chunk'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Разобрано постов: {posts}, комментариев: {comments}.'
+        ))
+
+    def backfill(self, rows, source, chunk_size):
+        done = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                rows.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+            )
+            if not chunk:
+                return done
+            last_pk = chunk[-1][0]
+            index_sources([source(*row) for row in chunk])
+            done += len(chunk)
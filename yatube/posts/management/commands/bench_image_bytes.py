@@ -0,0 +1,127 @@
+import re
+import tempfile
+from html import unescape
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFilter
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.images import image_storage
+from posts.models import Post
+from posts.thumbnails import create_variants
+
+User = get_user_model()
+
+PICTURE = re.compile(r'<picture>(.*?)</picture>', re.S)
+WEBP_SRCSET = re.compile(r'<source type="image/webp" srcset="([^"]+)"')
+IMG_SRC = re.compile(r'<img [^>]*src="([^"]+)"')
+
+# Кэш на время замера: страница должна собраться заново, а сбрасывать
+# настоящий кэш сайта ради этого нельзя.
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-image-bytes',
+    },
+}
+
+# Ширина окна в CSS-пикселях и плотность экрана.
+VIEWPORTS = ((320, 1), (360, 2), (414, 3), (768, 1), (1280, 1), (1280, 2))
+
+
+class Rollback(Exception):
+    pass
+
+
+def photo(size, seed):
+    """Картинка, которая сжимается примерно как фотография."""
+    noise = Image.effect_noise(size, 40 + seed % 20).filter(
+        ImageFilter.GaussianBlur(2)
+    )
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (
+        gradient, noise, gradient.rotate(90).resize(size)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает, сколько байт картинок загружает главная страница с '
+        'одной миниатюрой JPEG и с вариантами из srcset при разной ширине '
+        'экрана.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root, CACHES=BENCH_CACHES
+        ):
+            try:
+                with transaction.atomic():
+                    self.run(options['posts'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, count):
+        author = User.objects.create_user(username='image-bytes-author')
+        names = []
+        for number in range(count):
+            output = BytesIO()
+            photo((1600, 1067), number).save(output, 'JPEG', quality=90)
+            post = Post.objects.create(
+                author=author,
+                text=str(number),
+                image=SimpleUploadedFile(f'{number}.jpg', output.getvalue()),
+            )
+            create_variants(post.image.name)
+            names.append(post.image.name)
+        html = Client().get(reverse('posts:index')).content.decode()
+        pictures = PICTURE.findall(html)
+        before = sum(
+            self.size(IMG_SRC.search(picture)[1]) for picture in pictures
+        )
+        self.stdout.write(
+            f'Картинок на странице: {len(pictures)}; '
+            f'раньше (JPEG 600x400): {before / 1024:.1f} КБ'
+        )
+        for viewport, density in VIEWPORTS:
+            slot = min(viewport, 600) * density
+            after = sum(
+                self.choose(WEBP_SRCSET.search(picture)[1], slot)
+                for picture in pictures
+            )
+            self.stdout.write(
+                f'{viewport:5}px ×{density}: {after / 1024:8.1f} КБ '
+                f'({after / before:.0%})'
+            )
+        for name in names:
+            default.kvstore.delete(ImageFile(name, image_storage))
+
+    def choose(self, srcset, slot):
+        """Размер варианта, который выберет браузер: самый узкий не уже
+        слота, а если таких нет — самый широкий."""
+        candidates = sorted(
+            (int(width[:-1]), url)
+            for url, width in (
+                item.split() for item in unescape(srcset).split(', ')
+            )
+        )
+        for width, url in candidates:
+            if width >= slot:
+                return self.size(url)
+        return self.size(candidates[-1][1])
+
+    @staticmethod
+    def size(url):
+        return default.storage.size(unescape(url)[len(settings.MEDIA_URL):])
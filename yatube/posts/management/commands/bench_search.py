@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+SYLLABLES = (
+    'ба', 'ве', 'го', 'да', 'ле', 'ми', 'но', 'пра', 'ро', 'ста', 'ту',
+    'фи', 'хо', 'ца', 'че', 'ша', 'ю', 'я', 'ка', 'зо',
+)
+VOCABULARY_SIZE = 5000
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+def vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words, key=lambda word: rng.random())
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает первую страницу поиска по индексу FTS5 и по icontains '
+        'на нескольких объёмах постов. Данные создаются в транзакции, '
+        'которая затем откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[100_000, 1_000_000]
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search.supported():
+            self.stderr.write('Индекс FTS5 есть только на SQLite.')
+            return
+        try:
+            with transaction.atomic():
+                self.run(sorted(options['rows']), options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        rng = random.Random(0)
+        words = vocabulary(rng)
+        # Частоты слов по закону Ципфа, как в живом тексте.
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+        queries = {
+            'частое слово': words[0],
+            'редкое слово': words[-1],
+            'два слова': f'{words[10]} {words[50]}',
+            # Худший случай для icontains: просмотр всей таблицы.
+            'нет такого': 'щщщ',
+        }
+        author = User.objects.create_user(username='bench-search-author')
+        created = 0
+        for size in sizes:
+            while created < size:
+                count = min(BATCH_SIZE, size - created)
+                Post.objects.bulk_create(
+                    Post(
+                        author=author,
+                        text=' '.join(rng.choices(
+                            words, weights, k=rng.randint(10, 40)
+                        )),
+                    )
+                    for _ in range(count)
+                )
+                created += count
+            self.stdout.write(f'Постов: {size}')
+            for title, query in queries.items():
+                fts = self.measure(
+                    lambda: search.SearchPaginator(
+                        search.match_expression(query), 10
+                    ).cursor_page(), repeat,
+                )
+                like = self.measure(
+                    lambda: search.icontains_paginator(
+                        query, 10
+                    ).cursor_page(), repeat,
+                )
+                self.stdout.write(
+                    f'  {title:13} FTS5 {fts * 1000:8.1f} мс, '
+                    f'icontains {like * 1000:8.1f} мс'
+                )
+
+    @staticmethod
+    def measure(function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(function())
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
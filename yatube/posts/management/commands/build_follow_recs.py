@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации подписок по графу «подписки подписок». '
+        'Удобно запускать по расписанию раз в несколько часов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=None,
+            help='Сколько кандидатов хранить для каждого пользователя.',
+        )
+        parser.add_argument(
+            '--max-paths', type=int, default=None,
+            help='Сколько путей графа обрабатывать за один шаг.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = recommendations.build(
+            top=options['top'], max_paths=options['max_paths']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано рекомендаций: {written} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,115 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import encode_cursor
+
+User = get_user_model()
+
+# Кэш на время проверки: страницы должны ходить в базу, а сбрасывать
+# настоящий кэш сайта ради этого нельзя.
+CHECK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'check-query-plans',
+    },
+}
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет EXPLAIN QUERY PLAN для запросов, которые выполняют '
+        'страницы ленты, и падает, если какой-то из них читает таблицу '
+        'целиком или сортирует во временном B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=30,
+            help='Сколько постов добавить на время проверки.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживает только SQLite.')
+        problems = []
+        try:
+            with override_settings(CACHES=CHECK_CACHES), transaction.atomic():
+                urls, user = self.seed(options['seed'])
+                for url in urls:
+                    problems.extend(self.check_url(url, user))
+                raise Rollback
+        except Rollback:
+            pass
+        if problems:
+            for url, sql, detail in problems:
+                self.stderr.write(f'{url}: {detail}\n    {sql}')
+            raise CommandError(
+                f'Запросов с плохим планом: {len(problems)}.'
+            )
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы.'))
+
+    def seed(self, size):
+        author = User.objects.create_user(username='query-plan-author')
+        reader = User.objects.create_user(username='query-plan-reader')
+        group = Group.objects.create(
+            title='Query plans', slug='query-plan-group', description='-'
+        )
+        Follow.objects.create(user=reader, author=author)
+        posts = [
+            Post.objects.create(author=author, group=group, text=str(number))
+            for number in range(size)
+        ]
+        post = posts[-1]
+        comment = Comment.objects.create(post=post, author=reader, text='-')
+        cursor = encode_cursor([post.pub_date, post.pk])
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + f'?after={cursor}',
+            reverse('posts:group_list', args=(group.slug,)),
+            reverse('posts:group_list', args=(group.slug,))
+            + f'?after={cursor}',
+            reverse('posts:profile', args=(author.username,)),
+            reverse('posts:profile', args=(author.username,))
+            + f'?before={cursor}',
+            reverse('posts:post_detail', args=(post.pk,)),
+            reverse('posts:post_comments', args=(post.pk,))
+            + '?after=' + encode_cursor([comment.created, comment.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + f'?after={cursor}',
+        ]
+        return urls, reader
+
+    def check_url(self, url, user):
+        client = Client()
+        client.force_login(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            yield url, '-', f'статус ответа {response.status_code}'
+            return
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                if FULL_SCAN.match(step) or TEMP_SORT.search(step):
+                    yield url, sql, step
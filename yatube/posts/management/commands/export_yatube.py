@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в файл JSON Lines (со сжатием gzip, если имя кончается на .gz).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--chunk', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transfer.open_dump(options['path'], 'w') as stream:
+            written = transfer.export(stream, chunk_size=options['chunk'])
+        self.stdout.write(self.style.SUCCESS(
+            'Выгружено: ' + ', '.join(
+                f'{name} — {written[name]}' for name in transfer.MODELS
+            ) + f' за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts import media_gc
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT картинки, на которые не ссылаются посты, и '
+        'миниатюры, которые больше не нужны. С --dry-run только '
+        'показывает, что будет удалено.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько имён проверять в базе одним запросом.',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=50,
+            help='Удалений в секунду; 0 — без ограничения.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Файлы моложе стольких секунд не трогаются.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch = options['batch']
+        limit = media_gc.RateLimit(options['rate'])
+        phases = (
+            ('Картинок без постов',
+             media_gc.orphan_images(batch, options['min_age']),
+             media_gc.delete_image),
+            ('Записей о пропавших картинках',
+             media_gc.orphan_sources(batch),
+             media_gc.delete_image),
+            ('Миниатюр без записи',
+             media_gc.stale_thumbnails(batch, options['min_age']),
+             media_gc.delete_thumbnail),
+        )
+        for title, found, delete in phases:
+            count = total_size = 0
+            for name, size in found:
+                if options['verbosity'] > 1:
+                    self.stdout.write(name)
+                if not dry_run:
+                    limit.wait()
+                    if not delete(name):
+                        continue
+                count += 1
+                total_size += size
+            self.stdout.write(
+                f'{title}: {count} ({filesizeformat(total_size)})'
+            )
+        if dry_run:
+            self.stdout.write('Ничего не удалено: пробный запуск.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Мусор удалён.'))
@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_yatube. Прерванную загрузку можно '
+        'запустить снова с тем же --source: загруженное будет пропущено.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--source', default=None,
+            help='Имя выгрузки для сопоставления id, по умолчанию имя файла.',
+        )
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько записей вставлять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        importer = transfer.Importer(
+            options['source'] or os.path.basename(path),
+            batch_size=options['batch'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        started = time.monotonic()
+        try:
+            with transfer.open_dump(path) as stream:
+                importer.run(transfer.read(stream))
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        for name in transfer.MODELS:
+            self.stdout.write(
+                f'{name}: создано {importer.created[name]}, '
+                f'найдено в базе {importer.matched[name]}, '
+                f'пропущено без ссылок {importer.skipped[name]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка закончена за {time.monotonic() - started:.1f} с'
+        ))
+
+    def progress(self, name, created):
+        self.stdout.write(f'{name}: {created}')
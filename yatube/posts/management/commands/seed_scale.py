@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет в базу синтетических пользователей, группы, посты, '
+        'комментарии и подписки с неравномерными, как на живом сайте, '
+        'распределениями. Для нагрузочных проверок, не для боевой базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument(
+            '--comments', type=int, default=None,
+            help='По умолчанию столько же, сколько постов.',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=None,
+            help='По умолчанию одна на тысячу пользователей, не меньше 5.',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Среднее число подписок нового пользователя.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней раскидать даты постов.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            seed=options['seed'], days=options['days'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                created = seeder.run(
+                    users=options['users'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    groups=options['groups'],
+                    follows_per_user=options['follows'],
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: ' + ', '.join(
+                f'{name} — {count}' for name, count in created.items()
+            ) + f' за {time.monotonic() - started:.1f} с'
+        ))
+
+    def progress(self, name, created):
+        self.stdout.write(f'{name}: {created}')
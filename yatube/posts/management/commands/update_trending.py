@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает списки популярного и удаляет устаревшие часовые '
+        'счётчики. Удобно запускать по расписанию раз в несколько минут.'
+    )
+
+    def handle(self, *args, **options):
+        result = trending.update()
+        self.stdout.write(self.style.SUCCESS(
+            'Популярное пересчитано: ' + ', '.join(
+                f'{kind} — {len(result[kind])}' for kind in trending.KINDS
+            )
+        ))
@@ -0,0 +1,185 @@
+"""Поиск и удаление файлов в MEDIA_ROOT, на которые ничего не ссылается.
+
+Каталоги обходятся через `os.scandir` без сбора списка файлов, а имена
+проверяются по базе пачками, поэтому память не растёт с числом файлов.
+Мусор бывает трёх видов:
+
+* картинки, на которые не ссылается ни один пост; удаляются вместе с
+  миниатюрами и записями о них в хранилище ключей sorl-thumbnail;
+* записи хранилища ключей об исходных картинках, которых уже нет ни в
+  постах, ни на диске, — по ним удаляются оставшиеся миниатюры;
+* файлы миниатюр без записи в хранилище ключей.
+
+Свежие файлы не трогаются: пост мог ещё не зафиксироваться в базе, а
+миниатюру — ещё не записать в хранилище ключей.
+"""
+import logging
+import os
+import posixpath
+import time
+from itertools import islice
+
+from django.core.exceptions import SuspiciousFileOperation
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+from .images import image_storage
+from .models import Post, StoredImage
+from .thumbnails import _get_many_raw
+
+logger = logging.getLogger(__name__)
+
+
+def walk(storage, directory):
+    """Файлы каталога хранилища и его подкаталогов: пары (имя, stat)."""
+    stack = [directory]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(storage.path(directory))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = posixpath.join(directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry.stat(follow_symlinks=False)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def old_files(storage, directory, min_age):
+    cutoff = time.time() - min_age
+    for name, stat_result in walk(storage, directory):
+        if stat_result.st_mtime <= cutoff:
+            yield name, stat_result.st_size
+
+
+def orphan_images(batch_size, min_age):
+    """Картинки постов, на которые не ссылается ни один пост."""
+    directory = Post._meta.get_field('image').upload_to
+    for batch in batched(
+        old_files(image_storage, directory, min_age), batch_size
+    ):
+        referenced = set(Post.objects.filter(
+            image__in=[name for name, _ in batch]
+        ).values_list('image', flat=True))
+        for name, size in batch:
+            if name not in referenced:
+                yield name, size
+
+
+def stale_thumbnails(batch_size, min_age):
+    """Файлы миниатюр без записи в хранилище ключей sorl-thumbnail."""
+    for batch in batched(
+        old_files(default.storage, sorl_settings.THUMBNAIL_PREFIX, min_age),
+        batch_size,
+    ):
+        keys = {
+            name: add_prefix(ImageFile(name, default.storage).key)
+            for name, _ in batch
+        }
+        found = _get_many_raw(list(keys.values()))
+        for name, size in batch:
+            if keys[name] not in found:
+                yield name, size
+
+
+def orphan_sources(batch_size):
+    """Исходные картинки из хранилища ключей, которых нет ни в постах, ни
+    на диске.
+
+    Записи читаются из таблицы хранилища по курсору, поэтому работает
+    только с хранилищем ключей на базе данных.
+    """
+    if not isinstance(default.kvstore, CachedDBStore):
+        return
+    prefix = add_prefix('')
+    last_key = prefix
+    while True:
+        rows = list(KVStore.objects.filter(
+            key__startswith=prefix, key__gt=last_key
+        ).order_by('key').values_list('key', 'value')[:batch_size])
+        if not rows:
+            return
+        last_key = rows[-1][0]
+        sources = [
+            image for image in (
+                deserialize_image_file(value) for _, value in rows
+            )
+            if isinstance(image.storage, type(image_storage))
+        ]
+        referenced = set(Post.objects.filter(
+            image__in=[image.name for image in sources]
+        ).values_list('image', flat=True))
+        for image in sources:
+            if image.name not in referenced and not exists(image):
+                yield image.name, 0
+
+
+def exists(image):
+    try:
+        return image.exists()
+    except SuspiciousFileOperation:
+        # Имя вне MEDIA_ROOT: такой файл сборщик не трогает.
+        return True
+
+
+def delete_image(name):
+    """Удаляет картинку с миниатюрами, если на неё так и не сослался пост.
+
+    Повторная проверка нужна потому, что пост с такой же картинкой мог
+    появиться, пока шёл обход.
+    """
+    if Post.objects.filter(image=name).exists():
+        return False
+    StoredImage.objects.filter(name=name).delete()
+    try:
+        delete_with_thumbnails(ImageFile(name, image_storage))
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Не удалось удалить картинку %s', name, exc_info=True)
+        return False
+    return True
+
+
+def delete_thumbnail(name):
+    try:
+        default.storage.delete(name)
+    except OSError:
+        logger.warning('Не удалось удалить миниатюру %s', name, exc_info=True)
+        return False
+    return True
+
+
+class RateLimit:
+    """Не даёт выполнить больше `rate` действий в секунду; 0 — без
+    ограничения."""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self.next = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = self.clock()
+        if self.next is not None and self.next > now:
+            self.sleep(self.next - now)
+            now = self.next
+        self.next = now + self.interval
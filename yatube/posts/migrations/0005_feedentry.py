@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Последние FEED_BACKFILL_SIZE постов каждого автора для всех его
+# подписчиков одним запросом, как в posts.feeds.rebuild_feeds. Копия, а не
+# импорт: таблицы posts_userstats, которую тот запрос тоже читает, на этом
+# шаге ещё нет.
+FILL_SQL = '''
+{insert} posts_feedentry (user_id, post_id, pub_date)
+SELECT follow.user_id, latest.id, latest.pub_date
+FROM posts_follow follow
+JOIN (
+    SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+        PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+    ) AS position
+    FROM posts_post
+) latest
+ON latest.author_id = follow.author_id AND latest.position <= %s
+{suffix}
+'''
+
+
+def fill_feeds(apps, schema_editor):
+    ops = schema_editor.connection.ops
+    sql = FILL_SQL.format(
+        insert=ops.insert_statement(ignore_conflicts=True),
+        suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    schema_editor.execute(sql, [settings.FEED_BACKFILL_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0004_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='posts_feed_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -8,6 +10,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.title
@@ -29,8 +32,38 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Заполняются при сохранении картинки (см. posts.images.fill_meta);
+    # пустой объём — метаданные ещё не собирались, 0 — файла нет.
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_format = models.CharField(max_length=10, blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='posts_post_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='posts_post_author_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='posts_post_group_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -49,6 +82,14 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField('date published', auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='posts_comment_post_created_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -64,3 +105,217 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        ]
+
+
+class StoredImage(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField(max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='posts_feed_user_date_idx',
+            ),
+        ]
+
+
+class Tag(models.Model):
+    """Хештег из текста поста или комментария, без «#» и в нижнем
+    регистре."""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Хештег в посте или, если указан `comment`, в комментарии к нему."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_entries'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='tag_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('tag', 'post'),
+                condition=models.Q(comment=None),
+                name='unique_post_tag',
+            ),
+            models.UniqueConstraint(
+                fields=('tag', 'comment'),
+                condition=models.Q(comment__isnull=False),
+                name='unique_comment_tag',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('tag', '-pub_date', '-id'),
+                name='posts_posttag_tag_date_idx',
+            ),
+        ]
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в посте или комментарии к нему."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='mentions'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                condition=models.Q(comment=None),
+                name='unique_post_mention',
+            ),
+            models.UniqueConstraint(
+                fields=('user', 'comment'),
+                condition=models.Q(comment__isnull=False),
+                name='unique_comment_mention',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='posts_mention_user_date_idx',
+            ),
+        ]
+
+
+class ActivityBucket(models.Model):
+    """Взвешенное число событий с объектом за один час.
+
+    `kind` — вид объекта (пост, группа или автор), `hour` — номер часа
+    от начала эпохи Unix.
+    """
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveIntegerField()
+    hour = models.PositiveIntegerField(db_index=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('kind', 'hour', 'object_id'),
+                name='unique_activity_bucket',
+            ),
+        ]
+
+
+class FollowRecommendation(models.Model):
+    """Автор, на которого стоит подписаться `user`.
+
+    Таблицу целиком пересчитывает команда `build_follow_recs`; `mutual` —
+    сколько авторов из подписок пользователя подписаны на кандидата,
+    `rank` — место кандидата в списке, начиная с нуля.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_recommendations'
+    )
+    candidate = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    rank = models.PositiveSmallIntegerField()
+    mutual = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'rank'),
+                name='unique_follow_recommendation_rank',
+            ),
+        ]
+
+
+class ImportedRow(models.Model):
+    """Строка, перенесённая командой `import_yatube`: её id в выгрузке
+    `source` и id в этой базе. По этим записям переназначаются внешние
+    ключи и пропускаются уже загруженные строки при повторном запуске."""
+    source = models.CharField(max_length=255)
+    model = models.CharField(max_length=20)
+    old_id = models.PositiveIntegerField()
+    new_id = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('source', 'model', 'old_id'),
+                name='unique_imported_row',
+            ),
+        ]
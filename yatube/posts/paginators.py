@@ -0,0 +1,277 @@
+import base64
+import hashlib
+import json
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import AutoField, DateTimeField, IntegerField, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .fragments import feed_version
+
+POSTS_PER_PAGE = 10
+
+# Больше в целочисленный столбец не поместится.
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def encode_cursor(values):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    raw = json.dumps(
+        [value.isoformat() if hasattr(value, 'isoformat') else value
+         for value in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает значения ключа из токена или None, если он испорчен."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(values, list):
+        return None
+    decoded = []
+    for value in values:
+        if isinstance(value, str):
+            try:
+                value = parse_datetime(value)
+            except ValueError:
+                # Строка в формате даты, но с несуществующей датой.
+                return None
+            if value is None:
+                return None
+        elif not isinstance(value, (int, float)):
+            return None
+        decoded.append(value)
+    return decoded
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор: страница ищется по ключу `(pub_date, id)`
+    последней показанной записи, поэтому ни OFFSET, ни COUNT(*) не нужны,
+    и любая страница стоит столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), key=None):
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.key = key or self._key_from_fields
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_next = False
+        self._has_previous = False
+
+    def _key_from_fields(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _fits(self, field, value):
+        """Подходит ли значение из токена полю сортировки `field`.
+
+        Поле не из модели (например, оценка поиска) принимает число.
+        """
+        try:
+            field = self.object_list.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            field = None
+        if field is not None and field.is_relation:
+            field = field.target_field
+        if isinstance(field, DateTimeField):
+            return isinstance(value, datetime)
+        if isinstance(value, bool):
+            return False
+        if isinstance(field, (AutoField, IntegerField)):
+            return isinstance(value, int) and abs(value) <= MAX_INTEGER
+        if field is None:
+            return (
+                isinstance(value, (int, float))
+                and math.isfinite(value) and abs(value) <= MAX_INTEGER
+            )
+        return False
+
+    def _cursor_values(self, token):
+        """Значения ключа из токена или None, если токен испорчен или не
+        подходит к полям сортировки."""
+        values = decode_cursor(token) if token else None
+        if values is None or len(values) != len(self.fields):
+            return None
+        if not all(map(self._fits, self.fields, values)):
+            return None
+        return values
+
+    @staticmethod
+    def keyset_filter(ordering, values, reverse=False):
+        """Строит условие «строго после ключа» в порядке сортировки."""
+        fields = [field.lstrip('-') for field in ordering]
+        condition = Q()
+        for position, field in enumerate(ordering):
+            descending = field.startswith('-') != reverse
+            lookup = '__lt' if descending else '__gt'
+            step = Q(**{fields[position] + lookup: values[position]})
+            for previous in range(position):
+                step &= Q(**{fields[previous]: values[previous]})
+            condition |= step
+        return condition
+
+    def fetch(self, queryset, ordering, values, reverse):
+        """Читает `per_page + 1` строк после ключа `values`."""
+        if values is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(ordering, values, reverse)
+            )
+        queryset = queryset.order_by(*ordering)
+        if reverse:
+            queryset = queryset.reverse()
+        return list(queryset[:self.per_page + 1])
+
+    def _fetch(self, values, reverse):
+        return self.fetch(self.object_list, self.ordering, values, reverse)
+
+    def cursor_page(self, after=None, before=None):
+        """Возвращает страницу после курсора `after` или перед `before`."""
+        after_values = self._cursor_values(after)
+        before_values = self._cursor_values(before)
+        if before_values:
+            items = self._fetch(before_values, reverse=True)
+            self._has_previous = len(items) > self.per_page
+            self._has_next = True
+            items = items[:self.per_page][::-1]
+        else:
+            items = self._fetch(after_values, reverse=False)
+            self._has_previous = after_values is not None
+            self._has_next = len(items) > self.per_page
+            items = items[:self.per_page]
+        if items:
+            self.previous_cursor = encode_cursor(self.key(items[0]))
+            self.next_cursor = encode_cursor(self.key(items[-1]))
+        else:
+            self._has_next = False
+        number = 2 if self._has_previous else 1
+        return Page(items, number, self)
+
+    @property
+    def num_pages(self):
+        """Номера страниц условны: известно только, есть ли соседние."""
+        number = 2 if self._has_previous else 1
+        return number + 1 if self._has_next else number
+
+    @property
+    def cursor_mode(self):
+        return True
+
+
+class CachedCountPaginator(Paginator):
+    """Нумерованный пагинатор, который не считает COUNT(*) на каждый запрос.
+
+    Число записей хранится в кэше под версией ленты `version` и
+    сбрасывается вместе с ней; по умолчанию это поколение постов, лента
+    подписок передаёт ещё и поколение подписок пользователя. Для очень
+    больших нефильтрованных таблиц вместо точного COUNT(*) берётся
+    оценка. Вместо полного `page_range` страница получает окно `window`:
+    первая и последняя страницы и по три вокруг текущей.
+    """
+
+    ELLIPSIS = '…'
+    on_each_side = 3
+    on_ends = 1
+
+    def __init__(self, *args, version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = version
+
+    def _count_cache_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        version = self.version or feed_version()
+        return f'posts:paginator:count:{digest}:{version}'
+
+    def _estimate(self):
+        """Оценка числа строк нефильтрованной таблицы без её обхода."""
+        query = self.object_list.query
+        if query.where or query.distinct:
+            return None
+        model = self.object_list.model
+        connection = connections[self.object_list.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [model._meta.db_table],
+                )
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    'SELECT MAX(rowid) FROM '
+                    + connection.ops.quote_name(model._meta.db_table)
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+        estimate = int(row[0] or 0) if row else 0
+        if estimate < settings.PAGINATOR_ESTIMATE_THRESHOLD:
+            return None
+        return estimate
+
+    @cached_property
+    def count(self):
+        key = self._count_cache_key()
+        count = cache.get(key)
+        if count is None:
+            count = self._estimate()
+            if count is None:
+                count = Paginator.count.func(self)
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    def page_window(self, number):
+        """Номера страниц вокруг `number` с многоточиями в разрывах."""
+        last = self.num_pages
+        window = self.on_each_side + self.on_ends + 1
+        if last <= 2 * window:
+            yield from range(1, last + 1)
+            return
+        if number > window:
+            yield from range(1, self.on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - self.on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < last - window + 1:
+            yield from range(number + 1, number + self.on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(last - self.on_ends + 1, last + 1)
+        else:
+            yield from range(number + 1, last + 1)
+
+    def page(self, number):
+        page = super().page(number)
+        page.window = list(self.page_window(page.number))
+        return page
+
+
+def paginate(request, object_list, per_page=POSTS_PER_PAGE,
+             cursor_paginator=None, version=None):
+    """Страница ленты: курсорная по умолчанию, нумерованная для `?page=N`.
+
+    `version` — версия ленты для кэша числа записей нумерованной страницы.
+    """
+    if 'page' in request.GET:
+        paginator = CachedCountPaginator(
+            object_list, per_page, version=version
+        )
+        return paginator.get_page(request.GET.get('page'))
+    paginator = cursor_paginator or CursorPaginator(object_list, per_page)
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
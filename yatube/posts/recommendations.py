@@ -0,0 +1,170 @@
+"""Рекомендации «кого почитать»: авторы, на которых подписаны те, на кого
+подписан пользователь.
+
+Граф подписок целиком загружается в разреженную матрицу смежности в
+формате CSR (массивы `indptr` и `indices` NumPy), и пути длины два
+считаются векторно сразу для пачки пользователей. Кандидаты упорядочены
+по числу таких путей, при равенстве — по числу подписчиков. Команда
+`build_follow_recs` записывает по FOLLOW_RECS_TOP кандидатов каждого
+пользователя в `FollowRecommendation`, а страницы читают их одним
+запросом по индексу `(user, rank)`.
+"""
+import itertools
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .fragments import bump_recommendations_generation
+from .models import Follow, FollowRecommendation
+
+
+class FollowGraph:
+    """Подписки в формате CSR: авторы, на которых подписан пользователь с
+    номером `i`, — `indices[indptr[i]:indptr[i + 1]]`, по возрастанию.
+
+    Пользователи пронумерованы подряд; `ids[i]` — id пользователя `i`.
+    """
+
+    def __init__(self, followers, authors):
+        self.ids, inverse = np.unique(
+            np.concatenate([followers, authors]), return_inverse=True
+        )
+        rows, cols = inverse[:len(followers)], inverse[len(followers):]
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order]
+        self.indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(rows, minlength=self.size), out=self.indptr[1:]
+        )
+
+    @classmethod
+    def load(cls):
+        pairs = Follow.objects.values_list('user_id', 'author_id')
+        flat = np.fromiter(
+            itertools.chain.from_iterable(pairs.iterator()), dtype=np.int64
+        ).reshape(-1, 2)
+        return cls(flat[:, 0], flat[:, 1])
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def followers_counts(self):
+        return np.bincount(self.indices, minlength=self.size)
+
+    def neighbours(self, nodes):
+        """Все рёбра из `nodes`: номер узла в `nodes` и конец ребра."""
+        starts = self.indptr[nodes]
+        lengths = self.indptr[nodes + 1] - starts
+        owner = np.repeat(np.arange(len(nodes)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        return owner, self.indices[np.repeat(starts, lengths) + offsets]
+
+    def paths_counts(self):
+        """Число путей длины два из каждого узла."""
+        through = np.concatenate(
+            [[0], np.cumsum(self.degrees()[self.indices])]
+        )
+        return through[self.indptr[1:]] - through[self.indptr[:-1]]
+
+    def chunks(self, max_paths):
+        """Отрезки `(start, stop)` номеров пользователей, у которых вместе
+        не больше `max_paths` путей длины два, — столько строк займут
+        промежуточные массивы. Пользователь с большим числом путей
+        получает отрезок на себя одного."""
+        total = np.cumsum(self.paths_counts())
+        start = 0
+        while start < self.size:
+            done = total[start - 1] if start else 0
+            stop = int(np.searchsorted(total, done + max_paths, side='right'))
+            stop = max(stop, start + 1)
+            yield start, stop
+            start = stop
+
+
+def top_candidates(graph, start, stop, top, popularity):
+    """Лучшие `top` кандидатов для пользователей с номерами из
+    `[start, stop)`: массивы номеров пользователей, кандидатов, мест и
+    числа общих подписок."""
+    owner, middle = graph.neighbours(np.arange(start, stop))
+    source = start + owner
+    hop, candidate = graph.neighbours(middle)
+    source = source[hop]
+    size = graph.size
+    keys = source * size + candidate
+    followed = (start + owner) * size + middle
+    keep = (candidate != source) & ~np.isin(keys, followed)
+    keys, mutual = np.unique(keys[keep], return_counts=True)
+    source, candidate = np.divmod(keys, size)
+    order = np.lexsort((candidate, -popularity[candidate], -mutual, source))
+    source, candidate, mutual = (
+        source[order], candidate[order], mutual[order]
+    )
+    position = np.arange(len(source))
+    first = np.ones(len(source), dtype=bool)
+    first[1:] = source[1:] != source[:-1]
+    rank = position - np.maximum.accumulate(np.where(first, position, 0))
+    keep = rank < top
+    return source[keep], candidate[keep], rank[keep], mutual[keep]
+
+
+def build(top=None, max_paths=None, batch_size=1000):
+    """Пересчитывает таблицу рекомендаций целиком и возвращает число
+    записей. Старые рекомендации видны читателям до конца транзакции,
+    после неё сбрасываются ETag страниц с рекомендациями."""
+    top = top or settings.FOLLOW_RECS_TOP
+    max_paths = max_paths or settings.FOLLOW_RECS_MAX_PATHS
+    graph = FollowGraph.load()
+    popularity = graph.followers_counts()
+    written = 0
+    with transaction.atomic():
+        FollowRecommendation.objects.all().delete()
+        for start, stop in graph.chunks(max_paths):
+            source, candidate, rank, mutual = top_candidates(
+                graph, start, stop, top, popularity
+            )
+            FollowRecommendation.objects.bulk_create(
+                [
+                    FollowRecommendation(
+                        user_id=user_id, candidate_id=candidate_id,
+                        rank=position, mutual=count,
+                    )
+                    for user_id, candidate_id, position, count in zip(
+                        graph.ids[source].tolist(),
+                        graph.ids[candidate].tolist(),
+                        rank.tolist(),
+                        mutual.tolist(),
+                    )
+                ],
+                batch_size=batch_size,
+            )
+            written += len(source)
+    bump_recommendations_generation()
+    return written
+
+
+def for_user(user, exclude=None, limit=None):
+    """Рекомендованные пользователю авторы, кроме `exclude`."""
+    if not user.is_authenticated:
+        return []
+    limit = limit or settings.FOLLOW_RECS_SHOWN
+    recommended = FollowRecommendation.objects.filter(
+        user=user
+    ).select_related('candidate').order_by('rank')[:limit + 1]
+    return [
+        recommendation for recommendation in recommended
+        if recommendation.candidate_id != getattr(exclude, 'pk', None)
+    ][:limit]
+
+
+def followed(follow):
+    """Убирает из рекомендаций автора, на которого только что подписались."""
+    FollowRecommendation.objects.filter(
+        user_id=follow.user_id, candidate_id=follow.author_id
+    ).delete()
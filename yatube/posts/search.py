@@ -0,0 +1,214 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+На SQLite тексты индексируются таблицами FTS5 с внешним содержимым: сами
+тексты остаются в `posts_post` и `posts_comment`, а индексы обновляют
+триггеры, поэтому индекс не расходится с данными при любых способах
+записи, включая `bulk_create` и `QuerySet.update`. Результаты
+упорядочены по релевантности BM25, совпадение в комментарии весит меньше
+совпадения в самом посте. Для очень частых слов ранжируются только
+SEARCH_MAX_MATCHES самых новых совпадений.
+
+На других базах поиск сводится к `icontains`.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import CursorPaginator
+
+TABLES = {
+    'posts_post_fts': 'posts_post',
+    'posts_comment_fts': 'posts_comment',
+}
+
+# Множитель оценки BM25 (она отрицательная, меньше — лучше) для постов,
+# найденных по тексту комментария.
+COMMENT_WEIGHT = 0.5
+
+WORD = re.compile(r'\w+')
+
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+    "text, content='{table}', content_rowid='id')"
+)
+
+TRIGGERS = {
+    '{fts}_ai': (
+        'AFTER INSERT ON {table} BEGIN '
+        'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+    '{fts}_ad': (
+        'AFTER DELETE ON {table} BEGIN '
+        "INSERT INTO {fts}({fts}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); END"
+    ),
+    '{fts}_au': (
+        'AFTER UPDATE OF text ON {table} BEGIN '
+        "INSERT INTO {fts}({fts}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+}
+
+# Совпадения берутся в порядке rowid с LIMIT, который FTS5 выполняет без
+# сортировки, поэтому BM25 считается не больше SEARCH_MAX_MATCHES раз на
+# таблицу, как бы часто ни встречалось слово.
+SEARCH_SQL = '''
+SELECT post_id, MIN(score) AS best FROM (
+    SELECT * FROM (
+        SELECT rowid AS post_id, bm25(posts_post_fts) AS score
+        FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        ORDER BY rowid DESC LIMIT %s
+    )
+    UNION ALL
+    SELECT c.post_id, matches.score FROM (
+        SELECT rowid, bm25(posts_comment_fts) * %s AS score
+        FROM posts_comment_fts WHERE posts_comment_fts MATCH %s
+        ORDER BY rowid DESC LIMIT %s
+    ) AS matches
+    JOIN posts_comment c ON c.id = matches.rowid
+)
+GROUP BY post_id
+{having}
+ORDER BY best {direction}, post_id {direction}
+LIMIT %s
+'''
+
+
+def supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт таблицы FTS5 и триггеры и заполняет индексы."""
+    if not supported(using):
+        return
+    with using.cursor() as cursor:
+        for fts, table in TABLES.items():
+            cursor.execute(CREATE_TABLE.format(fts=fts, table=table))
+    repair(using)
+
+
+def repair(using=connection):
+    """Восстанавливает триггеры, которые пропали после миграций.
+
+    Пересоздание таблицы при миграции на SQLite удаляет её триггеры. Если
+    какого-то не хватало, индекс таблицы перестраивается заново. Таблицы
+    FTS5, которых ещё нет, не создаются: это дело миграции.
+    """
+    if not supported(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute('SELECT type, name FROM sqlite_master')
+        existing = set(cursor.fetchall())
+        for fts, table in TABLES.items():
+            if ('table', fts) not in existing:
+                continue
+            missing = {
+                name.format(fts=fts): body.format(fts=fts, table=table)
+                for name, body in TRIGGERS.items()
+                if ('trigger', name.format(fts=fts)) not in existing
+            }
+            for name, body in missing.items():
+                cursor.execute(f'CREATE TRIGGER {name} {body}')
+            if missing:
+                cursor.execute(
+                    f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+                )
+
+
+def uninstall(using=connection):
+    if not supported(using):
+        return
+    with using.cursor() as cursor:
+        for fts in TABLES:
+            for name in TRIGGERS:
+                name = name.format(fts=fts)
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов пользователя: все слова, каждое в кавычках,
+    чтобы знаки препинания не читались как синтаксис FTS5."""
+    return ' '.join(f'"{word}"' for word in WORD.findall(query))
+
+
+def post_key(post):
+    return [post.score, post.pk]
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная выдача поиска по ключу `(оценка, id)`."""
+
+    def __init__(self, match, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page,
+            ordering=('score', 'id'), key=post_key,
+        )
+        self.match = match
+
+    def _fetch(self, values, reverse):
+        having, params = '', []
+        if values is not None:
+            sign = '<' if reverse else '>'
+            having = (
+                f'HAVING best {sign} %s '
+                f'OR (best = %s AND post_id {sign} %s)'
+            )
+            params = [values[0], values[0], values[1]]
+        sql = SEARCH_SQL.format(
+            having=having, direction='DESC' if reverse else 'ASC'
+        )
+        with connection.cursor() as cursor:
+            limit = settings.SEARCH_MAX_MATCHES
+            cursor.execute(sql, [
+                self.match, limit, COMMENT_WEIGHT, self.match, limit,
+                *params, self.per_page + 1,
+            ])
+            scores = dict(cursor.fetchall())
+        posts = self.object_list.in_bulk(scores)
+        items = []
+        for pk, score in scores.items():
+            if pk in posts:
+                posts[pk].score = score
+                items.append(posts[pk])
+        return items
+
+
+def search_paginator(query, per_page):
+    """Пагинатор результатов поиска или None для пустого запроса."""
+    match = match_expression(query)
+    if not match:
+        return None
+    if supported():
+        return SearchPaginator(match, per_page)
+    return icontains_paginator(query, per_page)
+
+
+def icontains_paginator(query, per_page):
+    """Поиск без индекса: все слова запроса подстроками в тексте поста или
+    его комментария."""
+    condition = Q()
+    for word in WORD.findall(query):
+        condition &= (
+            Q(text__icontains=word) | Q(comments__text__icontains=word)
+        )
+    return CursorPaginator(
+        Post.objects.filter(condition).distinct().select_related(
+            'author', 'group'
+        ),
+        per_page,
+    )
+
+
+def matching_post_ids(query):
+    """Подзапрос id постов, в тексте которых есть все слова запроса."""
+    return RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        [match_expression(query)],
+    )
@@ -0,0 +1,241 @@
+"""Синтетические данные, чтобы проверять страницы на больших объёмах.
+
+Распределения неравномерные, как на живом сайте: активность авторов и
+число подписчиков подчиняются степенному закону, несколько «горячих»
+групп собирают большую часть постов, а комментарии приходят всплесками
+к немногим постам вскоре после публикации. Данные добавляются к уже
+существующим и пишутся `bulk_create` пачками по BATCH_SIZE; сигналы при
+этом не срабатывают, поэтому теги разбираются для каждой пачки, а
+счётчики и ленты подписок пересчитываются в конце.
+"""
+import random
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, feeds, tags
+from .models import Comment, Follow, Group, Post, User
+from .transfer import insert, original_dates, reset_sequences
+
+BATCH_SIZE = 5000
+TAGS_COUNT = 200
+
+# Доли постов в группе, с хештегом и с упоминанием.
+IN_GROUP = 0.7
+WITH_TAG = 0.2
+WITH_MENTION = 0.1
+
+# Средняя задержка комментария после публикации поста, в часах.
+COMMENT_DELAY_HOURS = 3
+
+
+def zipf(count, exponent=1.0):
+    """Накопленные веса закона Ципфа для `random.choices`."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def batches(total):
+    """Размеры пачек, на которые делится `total` строк."""
+    for start in range(0, total, BATCH_SIZE):
+        yield min(BATCH_SIZE, total - start)
+
+
+class Seeder:
+    """Генератор данных; одинаковый `seed` даёт одинаковые тексты."""
+
+    def __init__(self, seed=0, days=365, progress=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.now = timezone.now()
+        self.days = days
+        self.progress = progress
+        self.words = sorted(set(self.fake.words(nb=5000)))
+        self.rng.shuffle(self.words)
+        self.word_weights = zipf(len(self.words))
+        self.tags = [f'#{word}' for word in self.words[:TAGS_COUNT]]
+        self.tag_weights = zipf(len(self.tags))
+        self.created = Counter()
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.words, cum_weights=self.word_weights,
+            k=self.rng.randint(low, high),
+        ))
+
+    def report(self, name, count):
+        self.created[name] += count
+        if self.progress:
+            self.progress(name, self.created[name])
+
+    def run(self, users, posts, comments=None, groups=None,
+            follows_per_user=10):
+        """Добавляет пользователей, группы, посты, комментарии и подписки.
+
+        Авторы и группы выбираются из всех, что есть в базе, «популярность»
+        задаёт случайный порядок с весами Ципфа.
+        """
+        if groups is None:
+            groups = max(5, users // 1000)
+        with original_dates():
+            self.add_users(users)
+            self.add_groups(groups)
+            user_ids = list(User.objects.values_list('pk', flat=True))
+            if posts and not user_ids:
+                raise ValueError('Постам нужен хотя бы один пользователь.')
+            self.rng.shuffle(user_ids)
+            self.add_follows(users, user_ids, follows_per_user)
+            group_ids = list(Group.objects.values_list('pk', flat=True))
+            self.rng.shuffle(group_ids)
+            post_ids, published = self.add_posts(posts, user_ids, group_ids)
+            self.add_comments(
+                posts if comments is None else comments,
+                user_ids, post_ids, published,
+            )
+        reset_sequences([Post])
+        counters.rebuild()
+        feeds.rebuild_feeds()
+        return self.created
+
+    def add_users(self, total):
+        password = make_password(None)
+        for count in batches(total):
+            # Имена из Faker повторяются, случайный хвост делает их
+            # уникальными.
+            instances = [
+                User(
+                    username=(
+                        f'{self.fake.user_name()}_'
+                        f'{self.rng.getrandbits(64):016x}'
+                    ),
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    password=password,
+                    date_joined=self.now - timedelta(
+                        days=self.rng.uniform(0, self.days)
+                    ),
+                )
+                for _ in range(count)
+            ]
+            User.objects.bulk_create(instances)
+            self.report('user', count)
+
+    def add_groups(self, total):
+        instances = [
+            Group(
+                title=self.text(1, 3).capitalize(),
+                slug=f'group-{self.rng.getrandbits(48):x}',
+                description=self.fake.sentence(),
+            )
+            for _ in range(total)
+        ]
+        Group.objects.bulk_create(instances, ignore_conflicts=True)
+        self.report('group', total)
+
+    def add_follows(self, followers, user_ids, mean):
+        """Подписки новых пользователей: число подписок распределено по
+        Парето со средним `mean`, авторы выбираются по популярности."""
+        weights = zipf(len(user_ids))
+        newest = User.objects.order_by('-pk').values_list('pk', flat=True)
+        new_ids = list(newest[:followers])
+        step = max(1, BATCH_SIZE // max(mean, 1))
+        for start in range(0, len(new_ids), step):
+            chunk = new_ids[start:start + step]
+            instances = []
+            for user_id in chunk:
+                # Среднее распределения Парето с alpha=1.5 равно трём.
+                count = int(mean / 3 * self.rng.paretovariate(1.5))
+                authors = set(self.rng.choices(
+                    user_ids, cum_weights=weights, k=count
+                )) - {user_id}
+                instances.extend(
+                    Follow(user_id=user_id, author_id=author_id)
+                    for author_id in authors
+                )
+            Follow.objects.bulk_create(instances, ignore_conflicts=True)
+            self.report('follow', len(instances))
+
+    def add_posts(self, total, user_ids, group_ids):
+        author_weights = zipf(len(user_ids))
+        group_weights = zipf(len(group_ids), exponent=1.2)
+        # Упоминают сотню самых популярных пользователей.
+        mentioned = list(
+            User.objects.filter(pk__in=user_ids[:100]).values_list(
+                'username', flat=True
+            )
+        )
+        post_ids = array('q')
+        published = array('d')
+        for count in batches(total):
+            instances = []
+            for _ in range(count):
+                text = self.text(8, 60)
+                if self.rng.random() < WITH_TAG:
+                    text += ' ' + self.rng.choices(
+                        self.tags, cum_weights=self.tag_weights
+                    )[0]
+                if mentioned and self.rng.random() < WITH_MENTION:
+                    text += f' @{self.rng.choice(mentioned)}'
+                group_id = None
+                if group_ids and self.rng.random() < IN_GROUP:
+                    group_id = self.rng.choices(
+                        group_ids, cum_weights=group_weights
+                    )[0]
+                instances.append(Post(
+                    author_id=self.rng.choices(
+                        user_ids, cum_weights=author_weights
+                    )[0],
+                    group_id=group_id,
+                    text=text,
+                    pub_date=self.now - timedelta(
+                        days=self.rng.uniform(0, self.days)
+                    ),
+                ))
+            insert(Post, instances)
+            tags.index_sources(
+                (post.pk, None, post.pub_date, post.text)
+                for post in instances
+            )
+            post_ids.extend(post.pk for post in instances)
+            published.extend(post.pub_date.timestamp() for post in instances)
+            self.report('post', count)
+        return post_ids, published
+
+    def add_comments(self, total, user_ids, post_ids, published):
+        """Комментарии достаются немногим «горячим» постам и пишутся
+        вскоре после публикации."""
+        if not post_ids:
+            return
+        hot = list(range(len(post_ids)))
+        self.rng.shuffle(hot)
+        hot_weights = zipf(len(hot))
+        author_weights = zipf(len(user_ids))
+        now = self.now.timestamp()
+        for count in batches(total):
+            instances = []
+            for position in self.rng.choices(
+                hot, cum_weights=hot_weights, k=count
+            ):
+                created = min(
+                    now,
+                    published[position] + 3600 * self.rng.expovariate(
+                        1 / COMMENT_DELAY_HOURS
+                    ),
+                )
+                instances.append(Comment(
+                    post_id=post_ids[position],
+                    author_id=self.rng.choices(
+                        user_ids, cum_weights=author_weights
+                    )[0],
+                    text=self.text(3, 20),
+                    created=datetime.fromtimestamp(created, tz=timezone.utc),
+                ))
+            Comment.objects.bulk_create(instances)
+            self.report('comment', count)
@@ -0,0 +1,166 @@
+from django.db import connections
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from . import (
+    autocomplete, counters, feeds, fragments, images, recommendations,
+    search, tags, thumbnails, trending
+)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    old = None, '', None
+    if not raw and instance.pk is not None and not instance._state.adding:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first() or old
+    instance._old_group_id, instance._old_image, instance._old_text = old
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_meta(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not instance.image._committed or (
+        instance.image.name != instance._old_image
+    ):
+        images.fill_meta(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+    elif instance._old_group_id != instance.group_id:
+        counters.bump_group(instance._old_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, raw=False, **kwargs):
+    if raw or instance.image.name == instance._old_image:
+        return
+    images.retain(instance.image.name)
+    images.release(instance._old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.image.name != instance._old_image:
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def count_post_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.post_created(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post_tags(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance.text != instance._old_text):
+        tags.index_post(instance, created)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feed_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragments.bump_feed_generation()
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment_tags(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tags.index_comment(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.comment_created(instance, instance.post.group_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        feeds.backfill_feed(instance.user_id, instance.author_id)
+        fragments.bump_user_generation(instance.user_id)
+        trending.follow_created(instance)
+        recommendations.followed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_follower_feed(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    feeds.clear_feed(instance.user_id, instance.author_id)
+    feeds.author_unfollowed(instance.author_id)
+    fragments.bump_user_generation(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.user_saved(instance)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    autocomplete.removed(autocomplete.USER, instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.group_saved(instance)
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    autocomplete.removed(autocomplete.GROUP, instance.pk)
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.repair(connections[using])
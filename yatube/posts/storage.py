@@ -0,0 +1,69 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под SHA-256 своего содержимого, поэтому одинаковая
+картинка, загруженная повторно, ложится на уже существующий файл и
+получает его готовые миниатюры. Ссылки постов на файлы считает
+`posts.images`.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+def current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл как `<каталог>/<xx>/<sha256>.<расширение>`.
+
+    Содержимое читается один раз: пишется во временный файл и
+    одновременно хешируется, затем временный файл жёстко связывается с
+    именем по хешу. Если такой файл уже есть, новая копия не появляется.
+    `mkstemp` создаёт файл с правами 0600, поэтому перед связыванием ему
+    выставляются FILE_UPLOAD_PERMISSIONS или, как у обычного
+    `FileSystemStorage`, 0666 с учётом umask.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя выбирает _save по содержимому; из исходного имени
+        # берутся только каталог и расширение.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(
+            dir=self.path(directory), suffix='.upload'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            mode = self.file_permissions_mode
+            if mode is None:
+                mode = 0o666 & ~current_umask()
+            os.chmod(temporary, mode)
+            try:
+                os.link(temporary, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(temporary)
+        return name
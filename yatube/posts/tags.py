@@ -0,0 +1,122 @@
+"""Хештеги и упоминания пользователей в постах и комментариях.
+
+Текст разбирается один раз при сохранении, а найденное записывается в
+таблицы `PostTag` и `Mention` с индексами по тегу (пользователю) и дате,
+поэтому ленты тега и упоминаний читают диапазон индекса вместо LIKE по
+всем постам. При правке поста меняются только разошедшиеся записи.
+"""
+import re
+
+from .models import Mention, PostTag, Tag, User
+
+HASHTAG = re.compile(r'(?<![\w&#])#(\w{1,100})(?!\w)')
+MENTION = re.compile(r'(?<![\w@])@([\w.+-]{1,150})')
+
+
+def hashtags(text):
+    return {name.lower() for name in HASHTAG.findall(text)}
+
+
+def mentions(text):
+    """Имена после «@» без точки, которой могло закончиться предложение."""
+    return {name.rstrip('.') for name in MENTION.findall(text)} - {''}
+
+
+def tag_ids(names):
+    """Словарь «имя — id» тегов, недостающие теги создаются."""
+    if not names:
+        return {}
+    found = dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'id')
+    )
+    missing = set(names) - set(found)
+    if missing:
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in missing), ignore_conflicts=True
+        )
+        found.update(
+            Tag.objects.filter(name__in=missing).values_list('name', 'id')
+        )
+    return found
+
+
+def user_ids(usernames):
+    if not usernames:
+        return {}
+    return dict(
+        User.objects.filter(username__in=usernames).values_list(
+            'username', 'id'
+        )
+    )
+
+
+def index_sources(sources):
+    """Записывает теги и упоминания пачки текстов.
+
+    `sources` — кортежи (id поста, id комментария или None, дата, текст).
+    На всю пачку два запроса за тегами и пользователями и по одной
+    вставке в каждую таблицу; уже записанное пропускается.
+    """
+    parsed = [
+        (post_id, comment_id, pub_date, hashtags(text), mentions(text))
+        for post_id, comment_id, pub_date, text in sources
+    ]
+    tags = tag_ids(set().union(*(names for *_, names, _ in parsed)))
+    users = user_ids(set().union(*(names for *_, names in parsed)))
+    PostTag.objects.bulk_create(
+        [
+            PostTag(
+                tag_id=tags[name], post_id=post_id, comment_id=comment_id,
+                pub_date=pub_date,
+            )
+            for post_id, comment_id, pub_date, names, _ in parsed
+            for name in names
+        ],
+        ignore_conflicts=True,
+    )
+    Mention.objects.bulk_create(
+        [
+            Mention(
+                user_id=users[name], post_id=post_id, comment_id=comment_id,
+                pub_date=pub_date,
+            )
+            for post_id, comment_id, pub_date, _, names in parsed
+            for name in names
+            if name in users
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _sync(model, post, field, wanted):
+    """Приводит записи самого поста к набору id `wanted`."""
+    entries = model.objects.filter(post=post, comment=None)
+    existing = set(entries.values_list(field, flat=True))
+    if existing - wanted:
+        entries.filter(**{f'{field}__in': existing - wanted}).delete()
+    model.objects.bulk_create(
+        [
+            model(post=post, pub_date=post.pub_date, **{field: value})
+            for value in wanted - existing
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def index_post(post, created):
+    if created:
+        index_sources([(post.pk, None, post.pub_date, post.text)])
+        return
+    _sync(
+        PostTag, post, 'tag_id', set(tag_ids(hashtags(post.text)).values())
+    )
+    _sync(
+        Mention, post, 'user_id',
+        set(user_ids(mentions(post.text)).values()),
+    )
+
+
+def index_comment(comment):
+    index_sources(
+        [(comment.post_id, comment.pk, comment.created, comment.text)]
+    )
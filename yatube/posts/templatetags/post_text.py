@@ -0,0 +1,38 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.tags import HASHTAG, MENTION
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def linkify(text, autoescape=True):
+    """Превращает хештеги и упоминания в тексте в ссылки."""
+    escape = conditional_escape if autoescape else str
+    parts = []
+    position = 0
+    for match in sorted(
+        [*HASHTAG.finditer(text), *MENTION.finditer(text)],
+        key=lambda match: match.start(),
+    ):
+        if match.start() < position:
+            continue
+        name = match[1]
+        if match[0].startswith('#'):
+            url = reverse('posts:tag', args=(name.lower(),))
+        else:
+            name = name.rstrip('.')
+            if not name:
+                continue
+            url = reverse('posts:profile', args=(name,))
+        end = match.start() + 1 + len(name)
+        parts.append(escape(text[position:match.start()]))
+        parts.append(format_html(
+            '<a href="{}">{}</a>', url, text[match.start():end]
+        ))
+        position = end
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
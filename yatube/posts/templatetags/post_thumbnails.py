@@ -0,0 +1,16 @@
+from django import template
+
+from posts.thumbnails import cached_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_or_placeholder(image, geometry):
+    return cached_thumbnail(image, geometry)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(image_set, css_class=''):
+    """`<picture>` с вариантами картинки в WebP и JPEG разной ширины."""
+    return {'image': image_set, 'css_class': css_class}
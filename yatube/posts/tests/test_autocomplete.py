@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import autocomplete
+from posts.models import Group
+
+User = get_user_model()
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.leo = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.fyodor = User.objects.create_user(
+            username='fyodor', first_name='Фёдор', last_name='Достоевский'
+        )
+        cls.group = Group.objects.create(
+            title='Русская классика', slug='classics', description='-'
+        )
+
+    def setUp(self):
+        autocomplete.index.reset()
+
+    def labels(self, prefix):
+        return [item['label'] for item in autocomplete.suggest(prefix)]
+
+    def test_matches_username_name_and_group(self):
+        self.assertEqual(self.labels('le'), ['Лев Толстой (@leo)'])
+        self.assertEqual(self.labels('толс'), ['Лев Толстой (@leo)'])
+        self.assertEqual(self.labels('федор'), ['Фёдор Достоевский (@fyodor)'])
+        self.assertEqual(self.labels('КЛАСС'), ['Русская классика'])
+        self.assertEqual(self.labels('clas'), ['Русская классика'])
+        self.assertEqual(self.labels(''), [])
+        self.assertEqual(self.labels('zzz'), [])
+
+    def test_search_does_not_query_database(self):
+        autocomplete.suggest('l')
+        with self.assertNumQueries(0):
+            autocomplete.suggest('лев')
+
+    @override_settings(AUTOCOMPLETE_REBUILD_INTERVAL=-1)
+    def test_old_index_served_while_another_thread_rebuilds(self):
+        autocomplete.suggest('')
+        self.assertTrue(autocomplete.index.stale())
+        with autocomplete.index._rebuild_lock:
+            with self.assertNumQueries(0):
+                self.assertEqual(self.labels('le'), ['Лев Толстой (@leo)'])
+        with self.assertNumQueries(2):
+            autocomplete.suggest('le')
+
+    def test_signals_update_built_index(self):
+        autocomplete.suggest('')
+        self.leo.username = 'lev'
+        self.leo.save()
+        Group.objects.create(title='Поэзия', slug='poetry', description='-')
+        self.assertEqual(self.labels('leo'), [])
+        self.assertEqual(self.labels('lev'), ['Лев Толстой (@lev)'])
+        self.assertEqual(self.labels('поэ'), ['Поэзия'])
+        self.group.delete()
+        self.assertEqual(self.labels('classics'), [])
+
+    def test_limit(self):
+        User.objects.bulk_create(
+            User(username=f'leon{number}') for number in range(20)
+        )
+        autocomplete.index.reset()
+        self.assertEqual(len(autocomplete.suggest('leo', limit=5)), 5)
+
+    def test_endpoint(self):
+        response = Client().get(reverse('posts:autocomplete'), {'q': 'фё'})
+        self.assertEqual(response.json(), {'results': [{
+            'type': 'user',
+            'label': 'Фёдор Достоевский (@fyodor)',
+            'url': reverse('posts:profile', args=('fyodor',)),
+        }]})
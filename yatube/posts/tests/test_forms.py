@@ -1,15 +1,20 @@
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, ImageFile
 
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Group, Post
+from posts.uploads import normalize_image
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -161,3 +166,108 @@ class CommentFormTest(TestCase):
             reverse('posts:post_detail', kwargs={'post_id': self.post.id})
         )
         self.assertNotContains(response, 'Test comment forms')
+
+
+def jpeg(size=(40, 20), orientation=None):
+    image = Image.new('RGB', size, (200, 10, 10))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(
+        'photo.jpg', output.getvalue(), content_type='image/jpeg'
+    )
+
+
+def png(exif=None):
+    output = BytesIO()
+    options = {} if exif is None else {'exif': exif.tobytes()}
+    Image.new('RGB', (40, 20), (10, 200, 10)).save(output, 'PNG', **options)
+    return SimpleUploadedFile(
+        'picture.png', output.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadValidationTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader')
+        self.client.force_login(self.user)
+
+    def post(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': image},
+        )
+
+    @staticmethod
+    def media_files():
+        return [
+            name for _, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names
+        ]
+
+    def assertRejected(self, image, message):
+        files = self.media_files()
+        response = self.post(image)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(message, response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.media_files(), files)
+
+    def test_not_an_image_rejected_while_uploading(self):
+        upload = SimpleUploadedFile(
+            'fake.png', b'<?php echo 1; ?>', content_type='image/png'
+        )
+        self.assertRejected(upload, 'не похож на картинку')
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_oversized_file_rejected_while_uploading(self):
+        self.assertRejected(jpeg(), 'Картинка больше')
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        self.assertRejected(jpeg(), 'слишком большая')
+
+    def test_exif_stripped_and_orientation_applied(self):
+        self.post(jpeg(orientation=6))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertFalse(image.getexif())
+
+    @override_settings(IMAGE_MAX_SIDE=10)
+    def test_large_image_downscaled(self):
+        self.post(jpeg())
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertEqual(max(image.size), 10)
+
+    def test_plain_image_kept_as_is(self):
+        upload = jpeg()
+        content = upload.read()
+        upload.seek(0)
+        self.post(upload)
+        with Post.objects.get().image.open('rb') as image:
+            self.assertEqual(image.read(), content)
+
+    def test_plain_png_passed_through_without_decoding(self):
+        upload = png()
+        with mock.patch.object(
+            ImageFile.ImageFile, 'load', autospec=True
+        ) as load:
+            self.assertIs(normalize_image(upload), upload)
+        load.assert_not_called()
+
+    def test_png_exif_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        upload = normalize_image(png(exif))
+        with Image.open(upload) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertFalse(image.getexif())
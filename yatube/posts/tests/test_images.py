@@ -0,0 +1,416 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts import images, media_gc, thumbnails
+from posts.models import Post, StoredImage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def gif(name='small.gif', color=None):
+    content = SMALL_GIF
+    if color is not None:
+        output = BytesIO()
+        Image.new('RGB', (2, 1), color).save(output, 'GIF')
+        content = output.getvalue()
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_saving_image_schedules_thumbnails(self):
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            post = Post.objects.create(
+                author=self.author, text='С картинкой', image=gif()
+            )
+            schedule.assert_called_once_with(post.image.name)
+            post.text = 'Новый текст'
+            post.save()
+            schedule.assert_called_once()
+            Post.objects.create(author=self.author, text='Без картинки')
+            schedule.assert_called_once()
+
+    def test_pages_show_placeholder_without_resizing(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+        ]
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            for url in urls:
+                with self.subTest(url=url):
+                    cache.clear()
+                    response = self.client.get(url)
+                    self.assertContains(response, thumbnails.PLACEHOLDER)
+        get_image.assert_not_called()
+
+    def test_pages_show_generated_thumbnail(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        thumbnails.generate(post.image.name)
+        for geometry in thumbnails.WIDTHS:
+            image_set = thumbnails.cached_thumbnail(post.image, geometry)
+            self.assertTrue(image_set.ready)
+        image_set = thumbnails.cached_thumbnail(post.image, '600x400')
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, f'src="{image_set.url}"')
+        self.assertContains(response, f'srcset="{image_set.srcset}"')
+        self.assertNotContains(response, thumbnails.PLACEHOLDER)
+
+    def test_cached_feed_refreshed_when_thumbnails_ready(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertContains(response, thumbnails.PLACEHOLDER)
+        etag = response['ETag']
+        thumbnails.generate(post.image.name)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, thumbnails.PLACEHOLDER)
+        self.assertContains(
+            response,
+            thumbnails.cached_thumbnail(post.image, '600x400').url,
+        )
+
+    def test_picture_lists_webp_and_jpeg_widths(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        thumbnails.generate(post.image.name)
+        image_set = thumbnails.cached_thumbnail(post.image, '600x400')
+        (webp_type, webp_srcset), = image_set.sources
+        self.assertEqual(webp_type, 'image/webp')
+        for srcset, extension in (
+            (webp_srcset, '.webp'), (image_set.srcset, '.jpg')
+        ):
+            candidates = [item.split() for item in srcset.split(', ')]
+            self.assertEqual(
+                [width for _, width in candidates],
+                ['320w', '480w', '600w'],
+            )
+            for url, _ in candidates:
+                self.assertTrue(url.endswith(extension))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, f'<source type="image/webp" srcset="{webp_srcset}"'
+        )
+
+    def test_feed_looks_up_thumbnails_in_one_batch(self):
+        posts = [
+            Post.objects.create(
+                author=self.author,
+                text=str(number),
+                image=gif(color=(number, 0, 0)),
+            )
+            for number in range(5)
+        ]
+        for post in posts[:2]:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        kv_cache = default.kvstore.cache
+        with mock.patch.object(
+            kv_cache, 'get_many', wraps=kv_cache.get_many
+        ) as get_many, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kv_lookups = [
+            call for call in get_many.call_args_list
+            if call.args[0][0].startswith('sorl-thumbnail')
+        ]
+        self.assertEqual(len(kv_lookups), 1)
+        kv_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kv_queries), 1)
+        shown = {
+            post.pk: post.thumbnail
+            for post in response.context['page_obj']
+        }
+        for post in posts[:2]:
+            self.assertTrue(shown[post.pk].ready)
+        for post in posts[2:]:
+            self.assertFalse(shown[post.pk].ready)
+
+    def test_schedule_skips_queued_image(self):
+        with mock.patch('posts.thumbnails.transaction.on_commit') as commit:
+            thumbnails.schedule('posts/a.gif')
+            thumbnails.schedule('posts/a.gif')
+        commit.assert_called_once()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def create(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.author, text='С картинкой', image=gif(name)
+        )
+
+    def test_same_content_is_stored_once(self):
+        first = self.create('first.gif')
+        second = self.create('second.gif')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        self.assertEqual(
+            first.image.name, f'posts/{digest[:2]}/{digest}.gif'
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [f'{digest}.gif'])
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).refs, 2
+        )
+
+    @override_settings(FILE_UPLOAD_PERMISSIONS=None)
+    def test_file_permissions_follow_umask(self):
+        umask = os.umask(0o027)
+        try:
+            post = Post.objects.create(
+                author=self.author, image=gif(color=(1, 2, 3))
+            )
+        finally:
+            os.umask(umask)
+        mode = os.stat(post.image.path).st_mode & 0o777
+        self.assertEqual(mode, 0o640)
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create()
+        second = self.create()
+        name, path = first.image.name, first.image.path
+        first.delete()
+        images.delete_unused(name)
+        self.assertTrue(os.path.exists(path))
+        second.image = ''
+        second.save()
+        images.delete_unused(name)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_thumbnails_shared_between_duplicates(self):
+        first = self.create()
+        thumbnails.generate(first.image.name)
+        second = self.create('copy.gif')
+        thumbnail = thumbnails.cached_thumbnail(second.image, '600x400')
+        self.assertTrue(thumbnail.ready)
+
+    def test_release_keeps_referenced_file(self):
+        post = self.create()
+        images.retain(post.image.name)
+        images.release(post.image.name)
+        images.delete_unused(post.image.name)
+        self.assertTrue(os.path.exists(post.image.path))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetaTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+
+    def assertMeta(self, post, width, height, size, image_format):
+        self.assertEqual(
+            (post.image_width, post.image_height,
+             post.image_size, post.image_format),
+            (width, height, size, image_format),
+        )
+
+    def test_meta_filled_on_upload(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        post.refresh_from_db()
+        self.assertMeta(post, 2, 1, len(SMALL_GIF), 'GIF')
+        text_only = Post.objects.create(author=self.author, text='Текст')
+        self.assertMeta(text_only, None, None, None, '')
+
+    def test_meta_not_reread_for_unchanged_image(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        post.text = 'Новый текст'
+        with mock.patch('posts.images.fill_meta') as fill_meta:
+            post.save()
+        fill_meta.assert_not_called()
+        post.image = ''
+        post.save()
+        self.assertMeta(post, None, None, None, '')
+
+    def test_backfill_command(self):
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        missing = Post.objects.create(
+            author=self.author, text='Без файла', image=gif(color='red')
+        )
+        os.remove(missing.image.path)
+        Post.objects.update(
+            image_width=None, image_height=None,
+            image_size=None, image_format='',
+        )
+        call_command('backfill_image_meta', workers=1, stdout=StringIO())
+        post.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertMeta(post, 2, 1, len(SMALL_GIF), 'GIF')
+        self.assertMeta(missing, None, None, 0, '')
+
+    def test_picture_reserves_space(self):
+        Post.objects.create(
+            author=self.author, text='С картинкой', image=gif()
+        )
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'width="600" height="400"')
+
+    def test_unreadable_files_neither_shown_nor_queued(self):
+        missing = Post.objects.create(
+            author=self.author, text='Без файла', image=gif()
+        )
+        broken = Post.objects.create(
+            author=self.author, text='Не картинка', image=gif(color='red')
+        )
+        Post.objects.filter(pk=missing.pk).update(image_size=0)
+        Post.objects.filter(pk=broken.pk).update(
+            image_width=None, image_height=None
+        )
+        cache.clear()
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            for url in (
+                reverse('posts:index'),
+                reverse('posts:post_detail', args=[missing.pk]),
+                reverse('posts:post_detail', args=[broken.pk]),
+            ):
+                self.assertNotContains(Client().get(url), '<picture>')
+        schedule.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaGCTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.kept = Post.objects.create(
+            author=self.author, text='Остаётся', image=gif()
+        )
+        self.orphan = Post.objects.create(
+            author=self.author, text='Удалён', image=gif(color='red')
+        )
+        thumbnails.generate(self.orphan.image.name)
+        self.orphan_thumbnail = thumbnails.thumbnail_file(
+            self.orphan.image, '600x400',
+            dict(thumbnails.OPTIONS, format='JPEG'),
+        )
+        Post.objects.filter(pk=self.orphan.pk).update(image='')
+
+    def gc_media(self, **options):
+        options.setdefault('min_age', 0)
+        out = StringIO()
+        call_command('gc_media', rate=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_deletes_nothing(self):
+        out = self.gc_media(dry_run=True)
+        self.assertIn('Картинок без постов: 1', out)
+        self.assertTrue(os.path.exists(self.orphan.image.path))
+
+    def test_orphan_image_deleted_with_thumbnails(self):
+        self.gc_media()
+        self.assertFalse(os.path.exists(self.orphan.image.path))
+        self.assertFalse(self.orphan_thumbnail.exists())
+        self.assertFalse(
+            StoredImage.objects.filter(name=self.orphan.image.name).exists()
+        )
+        self.assertTrue(os.path.exists(self.kept.image.path))
+
+    def test_young_files_kept(self):
+        self.gc_media(min_age=60 * 60)
+        self.assertTrue(os.path.exists(self.orphan.image.path))
+
+    def test_thumbnails_of_missing_source_deleted(self):
+        os.remove(self.orphan.image.path)
+        self.gc_media()
+        self.assertFalse(self.orphan_thumbnail.exists())
+
+    def test_thumbnail_without_record_deleted(self):
+        name = default.storage.save(
+            'cache/00/00/' + '0' * 32 + '.jpg', BytesIO(b'jpeg')
+        )
+        self.gc_media()
+        self.assertFalse(default.storage.exists(name))
+
+    def test_names_checked_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(media_gc.orphan_images(batch_size=1000, min_age=0))
+        self.assertEqual(len(queries), 1)
+
+    def test_rate_limit(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limit = media_gc.RateLimit(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limit.wait()
+        self.assertEqual(sleeps, [0.25, 0.25])
@@ -0,0 +1,128 @@
+import random
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import recommendations
+from posts.models import Follow, FollowRecommendation
+
+User = get_user_model()
+
+
+def expected(follows, top):
+    """Рекомендации, посчитанные в лоб по словарю подписок."""
+    followers = Counter(
+        author for authors in follows.values() for author in authors
+    )
+    result = {}
+    for user, authors in follows.items():
+        mutual = Counter(
+            candidate
+            for author in authors
+            for candidate in follows.get(author, ())
+            if candidate != user and candidate not in authors
+        )
+        ranked = sorted(
+            mutual, key=lambda pk: (-mutual[pk], -followers[pk], pk)
+        )
+        if ranked:
+            result[user] = [(pk, mutual[pk]) for pk in ranked[:top]]
+    return result
+
+
+def stored():
+    result = {}
+    for user, candidate, mutual in FollowRecommendation.objects.order_by(
+        'user', 'rank'
+    ).values_list('user', 'candidate', 'mutual'):
+        result.setdefault(user, []).append((candidate, mutual))
+    return result
+
+
+class FollowRecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'user{n}') for n in range(5)
+        ]
+        reader, first, second, popular, quiet = cls.users
+        for user, author in (
+            (reader, first), (reader, second),
+            (first, popular), (second, popular), (first, quiet),
+            (popular, reader),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def test_ranks_friends_of_friends(self):
+        reader, first, second, popular, quiet = self.users
+        self.assertEqual(recommendations.build(), 6)
+        self.assertEqual(stored()[reader.pk], [(popular.pk, 2), (quiet.pk, 1)])
+        self.assertEqual(stored()[popular.pk], [(first.pk, 1), (second.pk, 1)])
+
+    def test_matches_brute_force_in_small_chunks(self):
+        rng = random.Random(23)
+        users = self.users + [
+            User.objects.create_user(username=f'extra{n}') for n in range(25)
+        ]
+        Follow.objects.bulk_create(
+            [
+                Follow(user=user, author=author)
+                for user in users
+                for author in rng.sample(users, rng.randint(0, 8))
+                if author != user
+            ],
+            ignore_conflicts=True,
+        )
+        follows = {}
+        for user, author in Follow.objects.values_list('user', 'author'):
+            follows.setdefault(user, set()).add(author)
+        recommendations.build(top=3, max_paths=10)
+        self.assertEqual(stored(), expected(follows, 3))
+
+    def test_empty_graph(self):
+        Follow.objects.all().delete()
+        self.assertEqual(recommendations.build(), 0)
+
+    @override_settings(FOLLOW_RECS_SHOWN=1)
+    def test_pages_show_recommendations(self):
+        reader, first, second, popular, quiet = self.users
+        call_command('build_follow_recs', stdout=StringIO())
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item.candidate for item in response.context['recommendations']],
+            [popular],
+        )
+        response = client.get(
+            reverse('posts:profile', args=(popular.username,))
+        )
+        self.assertEqual(
+            [item.candidate for item in response.context['recommendations']],
+            [quiet],
+        )
+        self.assertContains(response, 'Кого почитать')
+
+    def test_rebuild_changes_profile_etag(self):
+        reader, first, second, popular, quiet = self.users
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:profile', args=(popular.username,))
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        recommendations.build()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Кого почитать')
+
+    def test_follow_removes_recommendation(self):
+        reader, first, second, popular, quiet = self.users
+        recommendations.build()
+        Follow.objects.create(user=reader, author=popular)
+        self.assertEqual(stored()[reader.pk], [(quiet.pk, 1)])
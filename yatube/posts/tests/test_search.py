@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post
+from posts.paginators import decode_cursor
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.exact = Post.objects.create(
+            author=cls.author, text='Рецепт борща: свёкла, капуста, борщ.'
+        )
+        cls.other = Post.objects.create(
+            author=cls.author, text='Прогулка по лесу'
+        )
+        cls.commented = Post.objects.create(
+            author=cls.author, text='Ужин на даче'
+        )
+        Comment.objects.create(
+            post=cls.commented, author=cls.author, text='Где же борщ?'
+        )
+
+    def search(self, query, **params):
+        return Client().get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def found(self, query, **params):
+        return list(self.search(query, **params).context['page_obj'])
+
+    def test_finds_posts_by_text_and_comments(self):
+        self.assertEqual(self.found('борщ'), [self.exact, self.commented])
+        self.assertEqual(self.found('лесу'), [self.other])
+        self.assertEqual(self.found('борщ лесу'), [])
+
+    def test_index_follows_writes(self):
+        self.other.text = 'Прогулка по лесу за борщевиком и борщ'
+        self.other.save()
+        self.assertIn(self.other, self.found('борщ'))
+        Post.objects.filter(pk=self.exact.pk).update(text='Без супа')
+        self.assertNotIn(self.exact, self.found('борщ'))
+        self.commented.comments.all().delete()
+        self.assertNotIn(self.commented, self.found('борщ'))
+
+    def test_fts_syntax_in_query_is_escaped(self):
+        response = self.search('борщ" OR NEAR(*')
+        self.assertEqual(list(response.context['page_obj']), [])
+        response = self.search('')
+        self.assertIsNone(response.context['page_obj'])
+        self.assertTemplateUsed(response, 'posts/search.html')
+
+    def test_results_paginated_by_cursor(self):
+        posts = [
+            Post.objects.create(author=self.author, text=f'суп номер {n}')
+            for n in range(15)
+        ]
+        first = self.search('суп')
+        paginator = first.context['page_obj'].paginator
+        self.assertEqual(len(first.context['page_obj']), 10)
+        self.assertEqual(len(decode_cursor(paginator.next_cursor)), 2)
+        self.assertContains(first, '?q=%D1%81%D1%83%D0%BF&amp;after=')
+        second = self.found('суп', after=paginator.next_cursor)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(
+            set(first.context['page_obj']) | set(second), set(posts)
+        )
+
+    def test_repair_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_ai')
+        Post.objects.create(author=self.author, text='Солянка')
+        self.assertEqual(self.found('солянка'), [])
+        search.repair()
+        self.assertEqual(len(self.found('солянка')), 1)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'капуста'}
+            )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.exact]
+        )
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('posts_post_fts', sql)
+        self.assertNotIn('LIKE', sql)
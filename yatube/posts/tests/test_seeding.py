@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import (
+    Comment, FeedEntry, Follow, Group, Post, PostTag, User, UserStats,
+)
+
+
+class SeedScaleTests(TestCase):
+    def test_generates_skewed_data_with_derived_tables(self):
+        call_command(
+            'seed_scale', users=60, posts=600, comments=300, groups=5,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 600)
+        self.assertEqual(Comment.objects.count(), 300)
+        followers = list(
+            UserStats.objects.order_by('-followers_count').values_list(
+                'followers_count', flat=True
+            )
+        )
+        self.assertEqual(sum(followers), Follow.objects.count())
+        # Степенной закон: у самого популярного подписчиков намного
+        # больше, чем у типичного пользователя.
+        self.assertGreater(followers[0], 3 * followers[len(followers) // 2])
+        sizes = sorted(
+            Group.objects.values_list('posts_count', flat=True), reverse=True
+        )
+        self.assertGreater(sizes[0], 2 * sizes[-1])
+        self.assertTrue(PostTag.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        for comment in Comment.objects.select_related('post')[:50]:
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+
+    def test_adds_to_existing_data(self):
+        call_command('seed_scale', users=10, posts=20, stdout=StringIO())
+        call_command(
+            'seed_scale', users=10, posts=20, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(
+            UserStats.objects.filter(posts_count__gt=0).count(),
+            Post.objects.values('author').distinct().count(),
+        )
@@ -0,0 +1,133 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import tags
+from posts.models import (
+    Comment, Follow, Group, Mention, Post, PostTag, Tag
+)
+
+User = get_user_model()
+
+
+class TagParsingTests(TestCase):
+    def test_hashtags(self):
+        self.assertEqual(
+            tags.hashtags('#Python и #джанго, но не a#b и не &#39;'),
+            {'python', 'джанго'},
+        )
+
+    def test_mentions(self):
+        self.assertEqual(
+            tags.mentions('Привет, @leo. Пиши на leo@example.com, @a_b!'),
+            {'leo', 'a_b'},
+        )
+
+
+class TagIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.leo = User.objects.create_user(username='leo')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.leo)
+
+    def post(self, text):
+        return Post.objects.create(author=self.author, text=text)
+
+    def test_post_and_comment_indexed(self):
+        post = self.post('Читаю #классику, @leo советует')
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='И я #Классику @leo @nobody'
+        )
+        tag = Tag.objects.get(name='классику')
+        self.assertEqual(
+            set(tag.entries.values_list('post', 'comment')),
+            {(post.pk, None), (post.pk, comment.pk)},
+        )
+        self.assertEqual(self.leo.mentions.count(), 2)
+
+    def test_edit_applies_diff(self):
+        post = self.post('#один #два @leo')
+        kept = PostTag.objects.get(tag__name='один')
+        post.text = '#один #три'
+        post.save()
+        self.assertEqual(
+            set(post.tag_entries.values_list('tag__name', flat=True)),
+            {'один', 'три'},
+        )
+        self.assertTrue(PostTag.objects.filter(pk=kept.pk).exists())
+        self.assertFalse(Mention.objects.exists())
+
+    def test_tag_feed(self):
+        posts = [self.post(f'#суп номер {number}') for number in range(12)]
+        self.post('без тегов')
+        response = self.client.get(reverse('posts:tag', args=('Суп',)))
+        page = response.context['page_obj']
+        self.assertEqual(
+            [entry.post for entry in page], posts[::-1][:10]
+        )
+        self.assertContains(
+            response, f'<a href="{reverse("posts:tag", args=("суп",))}">'
+        )
+        second = self.client.get(
+            reverse('posts:tag', args=('суп',)),
+            {'after': page.paginator.next_cursor},
+        )
+        self.assertEqual(
+            [entry.post for entry in second.context['page_obj']],
+            posts[1::-1],
+        )
+        self.assertEqual(
+            self.client.get(reverse('posts:tag', args=('нет',))).status_code,
+            404,
+        )
+
+    def test_feeds_link_tags_and_mentions(self):
+        group = Group.objects.create(
+            title='Кухня', slug='kitchen', description='-'
+        )
+        Post.objects.create(
+            author=self.author, group=group, text='Варю #борщ для @leo'
+        )
+        Follow.objects.create(user=self.leo, author=self.author)
+        tag_link = f'<a href="{reverse("posts:tag", args=("борщ",))}">#борщ'
+        mention_link = (
+            f'<a href="{reverse("posts:profile", args=("leo",))}">@leo'
+        )
+        for url, query in (
+            (reverse('posts:index'), {}),
+            (reverse('posts:group_list', args=(group.slug,)), {}),
+            (reverse('posts:profile', args=(self.author.username,)), {}),
+            (reverse('posts:follow_index'), {}),
+            (reverse('posts:search'), {'q': 'борщ'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, query)
+                self.assertContains(response, tag_link)
+                self.assertContains(response, mention_link)
+
+    def test_mentions_feed(self):
+        post = self.post('Спасибо, @leo')
+        self.post('Без упоминаний')
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual(
+            [entry.post for entry in response.context['page_obj']], [post]
+        )
+
+    def test_backfill_command(self):
+        post = self.post('#старый пост для @leo')
+        Comment.objects.create(
+            post=post, author=self.author, text='#старый комментарий'
+        )
+        PostTag.objects.all().delete()
+        Mention.objects.all().delete()
+        call_command('backfill_tags', chunk=1, stdout=StringIO())
+        call_command('backfill_tags', stdout=StringIO())
+        self.assertEqual(PostTag.objects.count(), 2)
+        self.assertEqual(Mention.objects.count(), 1)
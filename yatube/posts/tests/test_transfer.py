@@ -0,0 +1,138 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts import transfer
+from posts.models import (
+    Comment, FeedEntry, Follow, Group, ImportedRow, Post, PostTag, UserStats,
+)
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', password='secret'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Кулинария', slug='cooking', description='Рецепты'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {n} #суп'
+            )
+            for n in range(7)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Спасибо, @author'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'dump.jsonl.gz')
+
+    def export(self):
+        call_command('export_yatube', self.path, chunk=2, stdout=StringIO())
+        return [
+            (post.text, post.pub_date)
+            for post in Post.objects.order_by('pub_date', 'pk')
+        ]
+
+    def import_(self, **options):
+        call_command(
+            'import_yatube', self.path, batch=3, stdout=StringIO(), **options
+        )
+
+    def test_round_trip_into_empty_database(self):
+        posts = self.export()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.import_()
+        author = User.objects.get(username='author')
+        self.assertEqual(author.first_name, 'Лев')
+        self.assertTrue(author.check_password('secret'))
+        self.assertEqual(
+            [
+                (post.text, post.pub_date)
+                for post in Post.objects.order_by('pub_date', 'pk')
+            ],
+            posts,
+        )
+        self.assertEqual(
+            set(Post.objects.values_list('author__username', 'group__slug')),
+            {('author', 'cooking')},
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author.username, 'reader')
+        self.assertEqual(comment.post.text, 'Пост 0 #суп')
+        self.assertTrue(
+            Follow.objects.filter(
+                user__username='reader', author=author
+            ).exists()
+        )
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 7)
+        self.assertEqual(Group.objects.get().posts_count, 7)
+        self.assertEqual(PostTag.objects.filter(comment=None).count(), 7)
+        self.assertEqual(author.mentions.count(), 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user__username='reader').count(), 7
+        )
+
+    def test_existing_users_and_groups_are_matched(self):
+        self.export()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        self.import_()
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(self.author.posts.count(), 7)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_existing_follows_not_counted_as_created(self):
+        self.export()
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        importer = transfer.Importer('dump')
+        with transfer.open_dump(self.path) as stream:
+            importer.run(transfer.read(stream))
+        self.assertEqual(importer.created['follow'], 0)
+        self.assertEqual(importer.matched['follow'], 1)
+        self.assertEqual(Follow.objects.count(), 2)
+
+    def test_interrupted_import_resumes(self):
+        self.export()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        def fail(name, created):
+            if name == 'post':
+                raise RuntimeError('обрыв связи')
+
+        importer = transfer.Importer('dump', batch_size=3, progress=fail)
+        with transfer.open_dump(self.path) as stream:
+            with self.assertRaises(RuntimeError):
+                importer.run(transfer.read(stream))
+        self.assertEqual(Post.objects.count(), 3)
+        self.import_(source='dump')
+        self.assertEqual(Post.objects.count(), 7)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            ImportedRow.objects.filter(source='dump', model='post').count(), 7
+        )
+        self.import_(source='dump')
+        self.assertEqual(Post.objects.count(), 7)
+
+    def test_rejects_foreign_files(self):
+        with open(self.path[:-3], 'w') as file:
+            file.write('[{"model": "auth.user"}]\n')
+        with self.assertRaises(CommandError):
+            call_command('import_yatube', self.path[:-3], stdout=StringIO())
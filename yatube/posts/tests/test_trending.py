@@ -0,0 +1,109 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import trending
+from posts.models import ActivityBucket, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=6, TRENDING_WINDOW_HOURS=48)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Кулинария', slug='cooking', description='-'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_writes_bump_hour_buckets(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        for _ in range(2):
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий'
+            )
+        Follow.objects.create(user=self.reader, author=self.author)
+        counts = {
+            (bucket.kind, bucket.object_id): bucket.count
+            for bucket in ActivityBucket.objects.all()
+        }
+        self.assertEqual(counts, {
+            (trending.GROUP, self.group.pk): trending.POST_WEIGHT + 2,
+            (trending.POST, post.pk): 2,
+            (trending.AUTHOR, self.author.pk): 1,
+        })
+        self.assertEqual(
+            set(ActivityBucket.objects.values_list('hour', flat=True)),
+            {trending.current_hour()},
+        )
+
+    def test_recent_activity_outranks_older(self):
+        old, recent = [
+            Post.objects.create(author=self.author, text=text)
+            for text in ('Вчерашний пост', 'Свежий пост')
+        ]
+        now = 1000
+        ActivityBucket.objects.bulk_create([
+            ActivityBucket(
+                kind=trending.POST, object_id=old.pk, hour=now - 12, count=10
+            ),
+            ActivityBucket(
+                kind=trending.POST, object_id=recent.pk, hour=now, count=3
+            ),
+            ActivityBucket(
+                kind=trending.POST, object_id=recent.pk, hour=now - 60,
+                count=100,
+            ),
+        ])
+        with mock.patch('posts.trending.current_hour', return_value=now):
+            scores = trending.scores(trending.POST, now)
+            self.assertAlmostEqual(scores[old.pk], 2.5)
+            self.assertAlmostEqual(scores[recent.pk], 3)
+            result = trending.update()
+        self.assertEqual(
+            [item['url'] for item in result[trending.POST]],
+            [reverse('posts:post_detail', args=(post.pk,))
+             for post in (recent, old)],
+        )
+        self.assertFalse(ActivityBucket.objects.filter(hour=now - 60).exists())
+
+    def test_index_sidebar_reads_cache_only(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Обсуждаемый пост'
+        )
+        Comment.objects.create(post=post, author=self.reader, text='!')
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Популярные группы')
+        call_command('update_trending', stdout=StringIO())
+        with mock.patch('posts.trending.update') as update:
+            response = client.get(reverse('posts:index'))
+        update.assert_not_called()
+        self.assertContains(response, 'Популярные группы')
+        self.assertContains(
+            response, reverse('posts:group_list', args=('cooking',))
+        )
+
+    def test_trending_page_reads_cache_only(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch('posts.trending.update') as update:
+            response = Client().get(reverse('posts:trending'))
+        update.assert_not_called()
+        self.assertNotContains(response, '@author')
+        self.assertContains(response, 'Пока тихо.')
+        call_command('update_trending', stdout=StringIO())
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('posts:trending'))
+        self.assertContains(response, '@author')
@@ -1,14 +1,22 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Follow, Group, Post
+from django.utils import timezone
+
+from core.query_budget import QueryBudgetExceeded, query_budget
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+from posts.paginators import CachedCountPaginator, encode_cursor
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -193,6 +201,128 @@ class PaginatorViewsTest(TestCase):
                 response = self.authorized_user.get(pages, {'page': 2})
             self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cursor_pages(self):
+        """Курсорная пагинация отдаёт все посты без OFFSET и COUNT."""
+        cursor_pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'auth'})
+        ]
+        for url in cursor_pages:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.authorized_user.get(url)
+                first_page = response.context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertTrue(first_page.has_next())
+                self.assertFalse(first_page.has_previous())
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_user.get(url, {
+                        'after': first_page.paginator.next_cursor
+                    })
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(second_page.has_previous())
+                for query in queries.captured_queries:
+                    self.assertNotIn('OFFSET', query['sql'])
+                self.assertEqual(
+                    {post.pk for post in first_page}
+                    & {post.pk for post in second_page},
+                    set()
+                )
+                response = self.authorized_user.get(url, {
+                    'before': second_page.paginator.previous_cursor
+                })
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    [post.pk for post in first_page]
+                )
+
+    def test_numbered_count_is_cached(self):
+        """COUNT(*) считается один раз до изменения постов."""
+        cache.clear()
+        self.authorized_user.get(reverse('posts:index'), {'page': 2})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_user.get(
+                reverse('posts:index'), {'page': 2}
+            )
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+        Post.objects.create(author=self.user, text='Ещё один пост')
+        response = self.authorized_user.get(
+            reverse('posts:index'), {'page': 2}
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+
+    def test_follow_feed_count_refreshed_on_follow(self):
+        """Подписка меняет число постов в ленте подписок, не трогая
+        поколение постов."""
+        cache.clear()
+        other = User.objects.create_user(username='other')
+        Post.objects.create(author=other, text='Пост другого автора')
+        Follow.objects.create(user=self.user, author=other)
+        url = reverse('posts:follow_index')
+        response = self.authorized_user.get(url, {'page': 1})
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        Follow.objects.create(user=self.user, author=PaginatorViewsTest.user)
+        response = self.authorized_user.get(url, {'page': 1})
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+
+    def test_page_window_is_elided(self):
+        paginator = CachedCountPaginator(
+            Post.objects.order_by('-pub_date', '-id'), 10
+        )
+        paginator.count = 1000
+        page = paginator.page(50)
+        self.assertEqual(
+            page.window,
+            [1, '…', 47, 48, 49, 50, 51, 52, 53, '…', 100]
+        )
+        self.assertEqual(
+            paginator.page(2).window,
+            [1, 2, 3, 4, 5, '…', 100]
+        )
+        self.assertEqual(
+            list(CachedCountPaginator(Post.objects.all(), 10).page_window(1)),
+            [1, 2]
+        )
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        response = self.authorized_user.get(
+            reverse('posts:index'), {'after': 'not-a-cursor'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_of_wrong_types_falls_back_to_first_page(self):
+        now = timezone.now().isoformat()
+        tokens = [
+            encode_cursor([1, 2]),
+            encode_cursor([now, now]),
+            encode_cursor([now, 10 ** 20]),
+            encode_cursor([now, True]),
+            encode_cursor([now, 1.5]),
+            encode_cursor(['2020-13-45T00:00:00', 1]),
+        ]
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            for token in tokens:
+                for direction in ('after', 'before'):
+                    with self.subTest(url=url, token=token, side=direction):
+                        response = self.authorized_user.get(
+                            url, {direction: token}
+                        )
+                        self.assertEqual(response.status_code, 200)
+                        self.assertFalse(
+                            response.context['page_obj'].has_previous()
+                        )
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -211,11 +341,39 @@ class CacheTests(TestCase):
         )
         response = self.authorized_client.get(reverse('posts:index'))
         response_first_content = response.content
-        Post.objects.all().delete()
+        Post.objects.update(text='Изменено в обход сигналов')
         response = self.authorized_client.get(reverse('posts:index'))
         response_second_content = response.content
         self.assertEquals(response_first_content, response_second_content)
 
+    def test_post_changes_invalidate_cache(self):
+        """Новый и удалённый пост сразу видны на главной."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.create(
+            author=self.user,
+            text='Свежий пост',
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+        post.delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Свежий пост')
+
+    def test_follow_fragments_are_per_user(self):
+        """Лента подписок не берётся из кэша главной и чужих лент."""
+        author = User.objects.create_user(username='cached_author')
+        Post.objects.create(author=author, text='Пост для подписчиков')
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Пост для подписчиков')
+        Follow.objects.create(user=self.user, author=author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Пост для подписчиков')
+        reader = User.objects.create_user(username='cached_reader')
+        self.client.force_login(reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Пост для подписчиков')
+
     def test_cashe_second(self):
         Post.objects.create(
             author=self.user,
@@ -290,3 +448,228 @@ class FollowTests(TestCase):
             reverse('posts:follow_index')
         )
         self.assertEqual(len(response_non_follower.context['page_obj']), 0)
+
+    def test_feed_entries_follow_subscriptions(self):
+        """Лента подписок материализуется при подписке и публикации."""
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following
+        )
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user_follower, post=self.post
+        ).exists())
+        new_post = Post.objects.create(
+            author=self.user_following,
+            text='Fan-out on write'
+        )
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user_follower, post=new_post
+        ).exists())
+        response = self.client_auth_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [new_post.pk, self.post.pk]
+        )
+        Follow.objects.filter(user=self.user_follower).delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user_follower).exists()
+        )
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_posts_pulled_on_read(self):
+        """Посты популярного автора читаются при открытии ленты."""
+        cache.clear()
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following
+        )
+        cache.clear()
+        Post.objects.create(author=self.user_following, text='Pulled')
+        self.assertFalse(FeedEntry.objects.exists())
+        response = self.client_auth_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+        cache.clear()
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_posts_materialized_when_author_stops_being_pulled(self):
+        """Посты, написанные, пока автор был популярным, остаются в ленте,
+        когда подписчиков становится меньше порога."""
+        cache.clear()
+        other = User.objects.create_user(username='other_follower')
+        Follow.objects.create(
+            user=self.user_follower, author=self.user_following
+        )
+        Follow.objects.create(user=other, author=self.user_following)
+        cache.clear()
+        pulled = Post.objects.create(
+            author=self.user_following, text='Pulled'
+        )
+        self.assertFalse(FeedEntry.objects.filter(post=pulled).exists())
+        Follow.objects.get(user=other).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user_follower, post=pulled
+        ).exists())
+        response = self.client_auth_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [pulled.pk, self.post.pk],
+        )
+        cache.clear()
+
+
+class QueryPlanTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы страниц ленты не читают таблицы целиком."""
+        cache.set('posts:query-plan:sentinel', True)
+        call_command('check_query_plans', seed=15, stdout=StringIO())
+        self.assertTrue(cache.get('posts:query-plan:sentinel'))
+
+
+@override_settings(DEBUG=True, QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Budget',
+            slug='budget',
+            description='Группа для бюджета запросов'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author if number % 2 else cls.reader,
+                group=cls.group,
+                text=f'Пост {number} #бюджет'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий @reader'
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Ответ'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_feed_pages_fit_query_budget(self):
+        """Страницы ленты укладываются в бюджет запросов."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:tag', kwargs={'name': 'бюджет'}),
+            reverse('posts:mentions'),
+            reverse('posts:trending'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_budget_overrun_fails(self):
+        with self.settings(QUERY_BUDGETS={'posts:index': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('posts:index'))
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(0):
+                list(Post.objects.all())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='The title',
+            slug='etag',
+            description='Some f_definitions'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Проверка ETag'
+        )
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменившиеся страницы отдают 304 без рендеринга."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertIsNone(response.context)
+
+    def test_changes_update_etag(self):
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        index_etag = self.client.get(reverse('posts:index'))['ETag']
+        detail_etag = self.client.get(detail)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(author=self.user, text='Ещё пост')
+        response = self.client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=index_etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentsPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}'
+            )
+            for number in range(7)
+        ]
+
+    def test_detail_shows_first_comments(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        page = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in page],
+            [comment.pk for comment in self.comments[:5]]
+        )
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_comments_fragment_continues_after_cursor(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        cursor = response.context['comments'].paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments_page.html')
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            [comment.pk for comment in self.comments[5:]]
+        )
+        self.assertNotContains(response, 'Показать ещё комментарии')
@@ -0,0 +1,256 @@
+"""Миниатюры картинок постов, которые готовятся в фоне.
+
+Страницы только ищут готовые миниатюры в хранилище ключей sorl-thumbnail
+и, если их ещё нет, показывают заглушку. Декодирование и ресайз
+выполняют потоки пула после сохранения поста.
+
+Для каждого размера из шаблонов готовится набор вариантов: несколько
+ширин в WebP и JPEG, из которых браузер выбирает по `srcset`.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.templatetags.static import static
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+from .fragments import bump_feed_generation
+from .images import has_usable_file, image_storage
+
+logger = logging.getLogger(__name__)
+
+# Размеры, которые используют шаблоны, и ширины, до которых их уменьшают
+# для srcset. Последняя ширина — сам размер из шаблона.
+WIDTHS = {
+    '600x400': (320, 480, 600),
+    '960x339': (480, 720, 960),
+}
+
+# Форматы в порядке предпочтения; последний служит запасным для <img>.
+FORMATS = ('WEBP', 'JPEG')
+
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+# WebP при том же визуальном качестве можно сжимать сильнее, чем JPEG.
+FORMAT_OPTIONS = {
+    'WEBP': {'quality': 80},
+    'JPEG': {},
+}
+
+PLACEHOLDER = 'img/placeholder.svg'
+
+QUEUED_KEY = 'posts:thumbnail:queued:{}'
+
+_executor = None
+
+
+def parse_geometry(geometry):
+    width, height = geometry.split('x')
+    return int(width), int(height)
+
+
+def variants(geometry):
+    """Пары (геометрия, параметры sorl) всех вариантов размера."""
+    width, height = parse_geometry(geometry)
+    for scaled in WIDTHS[geometry]:
+        scaled_geometry = f'{scaled}x{round(height * scaled / width)}'
+        for image_format in FORMATS:
+            yield scaled_geometry, dict(
+                OPTIONS, format=image_format, **FORMAT_OPTIONS[image_format]
+            )
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def create_variants(name):
+    """Создаёт все варианты миниатюр для картинки `name`."""
+    source = ImageFile(name, image_storage)
+    for geometry in WIDTHS:
+        for variant, options in variants(geometry):
+            get_thumbnail(source, variant, **options)
+
+
+def generate(name):
+    """Задача пула: варианты картинки, ошибки только в лог.
+
+    Ленты в кэше фрагментов и их ETag показывают заглушку, поэтому после
+    успешного создания вариантов поколение лент сдвигается.
+    """
+    try:
+        create_variants(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    else:
+        bump_feed_generation()
+    finally:
+        cache.delete(QUEUED_KEY.format(name))
+        connections.close_all()
+
+
+def schedule(name):
+    """Ставит картинку в очередь пула после фиксации транзакции.
+
+    Одна и та же картинка не ставится повторно, пока её не обработали,
+    в том числе другим процессом, если кэш общий.
+    """
+    if not name or not cache.add(
+        QUEUED_KEY.format(name), True, settings.THUMBNAIL_QUEUE_TIMEOUT
+    ):
+        return
+    transaction.on_commit(lambda: executor().submit(generate, name))
+
+
+def _options(source, options):
+    # Те же значения по умолчанию, что подставляет бэкенд sorl-thumbnail:
+    # от них зависит имя файла миниатюры.
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry, options):
+    """Файл миниатюры, каким его создаст sorl-thumbnail; без обращений к
+    хранилищу."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, options)
+    )
+    return ImageFile(name, default.storage)
+
+
+class ImageSet:
+    """Готовые варианты одной картинки для `<picture>`.
+
+    `url` и `srcset` — варианты запасного формата для `<img>`, `sources` —
+    пары (MIME-тип, srcset) для предпочтительных форматов. Пока вариантов
+    нет, `url` ведёт на заглушку, а остальное пусто.
+    """
+
+    def __init__(self, geometry, found=None):
+        self.width, self.height = parse_geometry(geometry)
+        self.sizes = f'(max-width: {self.width}px) 100vw, {self.width}px'
+        self.url = static(PLACEHOLDER)
+        self.srcset = ''
+        self.sources = []
+        self.ready = bool(found)
+        if not found:
+            return
+        srcsets = {}
+        for (image_format, _), thumbnail in sorted(
+            found.items(), key=lambda item: item[1].width
+        ):
+            srcsets.setdefault(image_format, []).append(
+                f'{thumbnail.url} {thumbnail.width}w'
+            )
+        *preferred, fallback = FORMATS
+        self.sources = [
+            (f'image/{name.lower()}', ', '.join(srcsets[name]))
+            for name in preferred
+        ]
+        self.srcset = ', '.join(srcsets[fallback])
+        self.url = found[fallback, geometry].url
+
+
+def _get_many_raw(keys):
+    """Значения из хранилища ключей sorl-thumbnail: один get_many к кэшу
+    и для промахов один запрос к таблице хранилища."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBStore):
+        found = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in found.items() if value}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        # Как и sorl-thumbnail, запоминаем в кэше и отсутствие значения.
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        found.update(fetched)
+    return {
+        key: value for key, value in found.items()
+        if value is not EMPTY_VALUE
+    }
+
+
+def cached_thumbnails(images, geometry):
+    """Наборы готовых вариантов для нескольких картинок сразу.
+
+    Возвращает словарь «имя картинки — ImageSet». Если каких-то вариантов
+    картинки ещё нет, в словаре заглушка, а картинка ставится в очередь.
+    Картинки при этом не открываются. Для картинок постов, у которых по
+    метаданным нет читаемого файла, в словаре None: миниатюр для них не
+    будет, и в очередь они не ставятся.
+    """
+    thumbnails = {}
+    usable = []
+    for image in images:
+        post = getattr(image, 'instance', None)
+        if post is None or has_usable_file(post):
+            usable.append(image)
+        else:
+            thumbnails[image.name] = None
+    keys = {
+        image.name: {
+            (options['format'], variant): add_prefix(
+                thumbnail_file(image, variant, options).key
+            )
+            for variant, options in variants(geometry)
+        }
+        for image in usable
+    }
+    found = _get_many_raw(list({
+        key for image_keys in keys.values() for key in image_keys.values()
+    }))
+    for name, image_keys in keys.items():
+        if all(key in found for key in image_keys.values()):
+            thumbnails[name] = ImageSet(geometry, {
+                variant: deserialize_image_file(found[key])
+                for variant, key in image_keys.items()
+            })
+        else:
+            schedule(name)
+            thumbnails[name] = ImageSet(geometry)
+    return thumbnails
+
+
+def cached_thumbnail(image, geometry):
+    """Набор вариантов одной картинки, заглушка или None."""
+    return cached_thumbnails([image], geometry)[image.name]
+
+
+def attach_thumbnails(posts, geometry):
+    """Проставляет `post.thumbnail` всем постам с картинкой, обращаясь к
+    хранилищу ключей один раз на страницу."""
+    posts = [post for post in posts if post.image]
+    thumbnails = cached_thumbnails([post.image for post in posts], geometry)
+    for post in posts:
+        post.thumbnail = thumbnails[post.image.name]
@@ -0,0 +1,307 @@
+"""Перенос пользователей, групп, постов, комментариев и подписок между
+базами без `dumpdata`/`loaddata`.
+
+Выгрузка — файл JSON Lines (сжатый gzip, если имя кончается на `.gz`):
+строка-заголовок и по строке на запись, модели по порядку зависимостей.
+Записи читаются итератором пачками и сразу пишутся в файл, загрузка
+читает файл построчно, так что память не растёт с размером данных.
+
+Загрузка вставляет пачки `bulk_create`, каждая пачка — своя транзакция.
+Строкам выдаются новые id, соответствие старых id новым хранится в
+`ImportedRow` и по нему переназначаются внешние ключи. Прерванную
+загрузку можно запустить снова: записанные пачки будут пропущены.
+Пользователи и группы, уже существующие в базе с тем же именем или
+адресом, не создаются, а сопоставляются с существующими.
+
+`bulk_create` не вызывает сигналы, поэтому теги разбираются для каждой
+пачки, а счётчики, учёт картинок и ленты подписок пересчитываются в
+конце загрузки. Файлы картинок переносятся отдельно.
+"""
+import gzip
+import json
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import groupby, islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import counters, feeds, tags
+from .images import META_FIELDS
+from .models import Comment, Follow, Group, ImportedRow, Post, User
+
+FORMAT = 'yatube'
+VERSION = 1
+
+MODELS = {
+    'user': (User, (
+        'username', 'first_name', 'last_name', 'email', 'password',
+        'is_active', 'is_staff', 'is_superuser', 'last_login',
+        'date_joined',
+    )),
+    'group': (Group, ('title', 'slug', 'description')),
+    'post': (Post, (
+        'author_id', 'group_id', 'text', 'pub_date', 'image', *META_FIELDS,
+    )),
+    'comment': (Comment, ('post_id', 'author_id', 'text', 'created')),
+    'follow': (Follow, ('user_id', 'author_id')),
+}
+
+# Внешние ключи и модели, на которые они ссылаются.
+REFERENCES = {
+    'post': {'author_id': 'user', 'group_id': 'group'},
+    'comment': {'post_id': 'post', 'author_id': 'user'},
+    'follow': {'user_id': 'user', 'author_id': 'user'},
+}
+
+# Уникальные поля, по которым запись совпадает с уже существующей.
+NATURAL_KEYS = {'user': 'username', 'group': 'slug'}
+
+
+def open_dump(path, mode='r'):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False, default=_encode) + '\n'
+
+
+def export(stream, chunk_size=2000):
+    """Пишет выгрузку в `stream` и возвращает число записей по моделям."""
+    written = Counter()
+    stream.write(_line({'format': FORMAT, 'version': VERSION}))
+    with transaction.atomic():
+        for name, (model, fields) in MODELS.items():
+            rows = model.objects.order_by('pk').values_list('pk', *fields)
+            for pk, *values in rows.iterator(chunk_size=chunk_size):
+                stream.write(_line({
+                    'model': name, 'pk': pk,
+                    'fields': dict(zip(fields, values)),
+                }))
+                written[name] += 1
+    return written
+
+
+def read(stream):
+    """Записи выгрузки из `stream` по одной."""
+    header = json.loads(next(stream, 'null'))
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise ValueError('Файл не похож на выгрузку Yatube.')
+    if header.get('version') != VERSION:
+        raise ValueError(
+            f'Версия выгрузки {header.get("version")} не поддерживается.'
+        )
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def in_chunks(values):
+    """Значения пачками, которые помещаются в один запрос с `IN`."""
+    values = list(values)
+    step = (connection.features.max_query_params or 10000) - 10
+    for start in range(0, len(values), step):
+        yield values[start:start + step]
+
+
+def insert(model, instances):
+    """Вставляет строки и проставляет им id.
+
+    Если база возвращает id из пакетной вставки (PostgreSQL), их выдаёт
+    последовательность, как и при обычной записи с сайта. SQLite id не
+    возвращает, поэтому строки получают id подряд после последнего: запись
+    в SQLite идёт одной транзакцией за раз, а AUTOINCREMENT сам сдвигает
+    счётчик за явно вставленные id.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        model.objects.bulk_create(instances)
+        return
+    last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    for offset, instance in enumerate(instances, start=1):
+        instance.pk = last + offset
+    model.objects.bulk_create(instances)
+
+
+def reset_sequences(models):
+    """Сдвигает счётчики id за вставленные явно строки."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+@contextmanager
+def original_dates():
+    """Отключает `auto_now_add`, чтобы `bulk_create` не затирал даты
+    публикации из выгрузки."""
+    date_fields = [
+        Post._meta.get_field('pub_date'), Comment._meta.get_field('created')
+    ]
+    for field in date_fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in date_fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загрузка выгрузки `source` пачками по `batch_size` записей."""
+
+    def __init__(self, source, batch_size=1000, progress=None):
+        self.source = source
+        self.batch_size = batch_size
+        self.progress = progress
+        self.created = Counter()
+        self.matched = Counter()
+        self.skipped = Counter()
+
+    def run(self, records):
+        with original_dates():
+            for name, rows in groupby(records, key=lambda row: row['model']):
+                if name not in MODELS:
+                    raise ValueError(f'Неизвестная модель «{name}».')
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    with transaction.atomic():
+                        self.load(name, batch)
+                    if self.progress:
+                        self.progress(name, self.created[name])
+        self.finish()
+
+    def known(self, name, old_ids):
+        """Новые id уже загруженных записей модели `name`."""
+        rows = ImportedRow.objects.filter(source=self.source, model=name)
+        found = {}
+        for chunk in in_chunks(set(old_ids)):
+            found.update(
+                rows.filter(old_id__in=chunk).values_list('old_id', 'new_id')
+            )
+        return found
+
+    def remember(self, name, pairs):
+        ImportedRow.objects.bulk_create(
+            ImportedRow(
+                source=self.source, model=name, old_id=old_id, new_id=new_id
+            )
+            for old_id, new_id in pairs
+        )
+
+    def remap(self, name, batch):
+        """Поля записей с переназначенными ссылками; записи, ссылки
+        которых не нашлись, пропускаются."""
+        references = REFERENCES.get(name, {})
+        mappings = {
+            field: self.known(target, (
+                row['fields'][field] for row in batch
+                if row['fields'][field] is not None
+            ))
+            for field, target in references.items()
+        }
+        for row in batch:
+            values = dict(row['fields'])
+            for field, mapping in mappings.items():
+                if values[field] is None:
+                    continue
+                values[field] = mapping.get(values[field])
+                if values[field] is None:
+                    self.skipped[name] += 1
+                    break
+            else:
+                yield row['pk'], values
+
+    def load(self, name, batch):
+        model, names = MODELS[name]
+        if name == 'follow':
+            self.load_follows(batch)
+            return
+        done = self.known(name, (row['pk'] for row in batch))
+        rows = list(self.remap(
+            name, [row for row in batch if row['pk'] not in done]
+        ))
+        key = NATURAL_KEYS.get(name)
+        if key:
+            existing = {}
+            for chunk in in_chunks([values[key] for _, values in rows]):
+                existing.update(
+                    model.objects.filter(
+                        **{f'{key}__in': chunk}
+                    ).values_list(key, 'pk')
+                )
+            matched = [
+                (old_id, existing[values[key]])
+                for old_id, values in rows if values[key] in existing
+            ]
+            self.remember(name, matched)
+            self.matched[name] += len(matched)
+            rows = [row for row in rows if row[1][key] not in existing]
+        if not rows:
+            return
+        fields = {field: model._meta.get_field(field) for field in names}
+        instances = [self.build(model, fields, values) for _, values in rows]
+        insert(model, instances)
+        self.remember(name, (
+            (old_id, instance.pk)
+            for (old_id, _), instance in zip(rows, instances)
+        ))
+        self.created[name] += len(instances)
+        if name == 'post':
+            tags.index_sources(
+                (post.pk, None, post.pub_date, post.text)
+                for post in instances
+            )
+        elif name == 'comment':
+            tags.index_sources(
+                (comment.post_id, comment.pk, comment.created, comment.text)
+                for comment in instances
+            )
+
+    def load_follows(self, batch):
+        """Подписки уникальны: уже существующие считаются найденными в
+        базе, а созданными — только новые."""
+        pairs = {
+            (values['user_id'], values['author_id'])
+            for _, values in self.remap('follow', batch)
+        }
+        if not pairs:
+            return
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        new = pairs - existing
+        # Подписку могли создать с сайта уже после проверки.
+        Follow.objects.bulk_create(
+            [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in sorted(new)
+            ],
+            ignore_conflicts=True,
+        )
+        self.created['follow'] += len(new)
+        self.matched['follow'] += len(pairs & existing)
+
+    @staticmethod
+    def build(model, fields, values):
+        return model(**{
+            name: fields[name].to_python(value)
+            for name, value in values.items()
+        })
+
+    def finish(self):
+        """Пересчитывает то, что при обычной записи обновляют сигналы."""
+        reset_sequences([User, Group, Post, Comment])
+        counters.rebuild()
+        feeds.rebuild_feeds()
@@ -0,0 +1,145 @@
+"""Популярное: посты, группы и авторы с самой заметной недавней активностью.
+
+При записи событие только прибавляется к часовому счётчику объекта
+(`ActivityBucket`). Оценка — сумма счётчиков за последние
+TRENDING_WINDOW_HOURS часов, где каждый час весит вдвое меньше, чем час
+на TRENDING_HALF_LIFE_HOURS позже. Лучшие TRENDING_TOP объектов каждого
+вида считаются не при просмотре страниц, а командой `update_trending`, и
+хранятся в кэше уже готовыми для шаблона; страница «Популярное» и боковая
+колонка главной только читают кэш.
+"""
+import heapq
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.urls import reverse
+from django.utils.text import Truncator
+
+from .models import ActivityBucket, Group, Post, User
+
+POST = 'post'
+GROUP = 'group'
+AUTHOR = 'author'
+KINDS = (POST, GROUP, AUTHOR)
+
+# Вес событий: новый пост в группе заметнее одного комментария.
+POST_WEIGHT = 3
+COMMENT_WEIGHT = 1
+FOLLOW_WEIGHT = 1
+
+CACHE_KEY = 'posts:trending'
+
+
+def current_hour():
+    return int(time.time() // 3600)
+
+
+def bump(kind, object_id, weight):
+    """Прибавляет `weight` к счётчику объекта за текущий час."""
+    if object_id is None:
+        return
+    lookup = {'kind': kind, 'object_id': object_id, 'hour': current_hour()}
+    buckets = ActivityBucket.objects.filter(**lookup)
+    if buckets.update(count=F('count') + weight):
+        return
+    _, created = ActivityBucket.objects.get_or_create(
+        **lookup, defaults={'count': weight}
+    )
+    if not created:
+        buckets.update(count=F('count') + weight)
+
+
+def post_created(post):
+    bump(GROUP, post.group_id, POST_WEIGHT)
+
+
+def comment_created(comment, group_id):
+    bump(POST, comment.post_id, COMMENT_WEIGHT)
+    bump(GROUP, group_id, COMMENT_WEIGHT)
+
+
+def follow_created(follow):
+    bump(AUTHOR, follow.author_id, FOLLOW_WEIGHT)
+
+
+def scores(kind, now):
+    """Оценки объектов вида `kind` с затуханием по часам."""
+    first = now - settings.TRENDING_WINDOW_HOURS + 1
+    half_life = settings.TRENDING_HALF_LIFE_HOURS
+    totals = defaultdict(float)
+    for object_id, hour, count in ActivityBucket.objects.filter(
+        kind=kind, hour__gte=first
+    ).values_list('object_id', 'hour', 'count').iterator():
+        totals[object_id] += count * 0.5 ** ((now - hour) / half_life)
+    return totals
+
+
+def describe(kind, ids):
+    """Данные для шаблона: заголовок и адрес объектов с `ids`."""
+    if kind == POST:
+        posts = Post.objects.select_related('author').in_bulk(ids)
+        return {
+            pk: {
+                'title': Truncator(post.text).words(12),
+                'subtitle': post.author.get_full_name()
+                or post.author.username,
+                'url': reverse('posts:post_detail', args=(pk,)),
+            }
+            for pk, post in posts.items()
+        }
+    if kind == GROUP:
+        groups = Group.objects.in_bulk(ids)
+        return {
+            pk: {
+                'title': group.title,
+                'subtitle': f'#{group.slug}',
+                'url': reverse('posts:group_list', args=(group.slug,)),
+            }
+            for pk, group in groups.items()
+        }
+    users = User.objects.in_bulk(ids)
+    return {
+        pk: {
+            'title': user.get_full_name() or user.username,
+            'subtitle': f'@{user.username}',
+            'url': reverse('posts:profile', args=(user.username,)),
+        }
+        for pk, user in users.items()
+    }
+
+
+def update():
+    """Пересчитывает списки популярного и удаляет вышедшие из окна часы."""
+    now = current_hour()
+    ActivityBucket.objects.filter(
+        hour__lte=now - settings.TRENDING_WINDOW_HOURS
+    ).delete()
+    result = {'computed_at': time.time()}
+    for kind in KINDS:
+        best = heapq.nlargest(
+            settings.TRENDING_TOP, scores(kind, now).items(),
+            key=lambda item: (item[1], item[0]),
+        )
+        described = describe(kind, [object_id for object_id, _ in best])
+        result[kind] = [
+            dict(described[object_id], score=round(score, 2))
+            for object_id, score in best
+            if object_id in described
+        ]
+    # Списки живут дольше срока свежести, чтобы боковой колонке было что
+    # показать, пока их не пересчитали.
+    cache.set(CACHE_KEY, result, settings.TRENDING_CACHE_TIMEOUT * 12)
+    return result
+
+
+def cached():
+    """Последние посчитанные списки или None, если их ещё нет."""
+    return cache.get(CACHE_KEY)
+
+
+def computed_at():
+    result = cached()
+    return result and result['computed_at']
@@ -0,0 +1,144 @@
+"""Проверка загружаемых картинок с ограниченным расходом памяти.
+
+Размер и сигнатура файла проверяются обработчиком загрузки, пока запрос
+читается порциями: слишком большой файл или не картинка отбрасываются,
+не доходя до диска. Размеры в пикселях читаются из заголовка без
+декодирования, а перекодируется картинка, только если в ней есть EXIF или
+она больше допустимого, — один раз и с черновым декодированием JPEG.
+"""
+import struct
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Сигнатуры форматов, которые сохраняются как есть или перекодируются.
+SIGNATURES = (
+    b'\xff\xd8\xff',
+    b'\x89PNG\r\n\x1a\n',
+    b'GIF87a',
+    b'GIF89a',
+)
+
+REENCODED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+
+def looks_like_image(head):
+    if head.startswith(SIGNATURES):
+        return True
+    return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+
+
+class RejectedUpload(UploadedFile):
+    """Пустой файл на месте отклонённой загрузки с причиной отказа."""
+
+    def __init__(self, name, error):
+        super().__init__(BytesIO(), name, 'application/octet-stream', 0)
+        self.error = error
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Отбраковывает загрузки, пока они читаются из запроса.
+
+    Стоит в FILE_UPLOAD_HANDLERS перед стандартными обработчиками. Пока
+    файл в порядке, порции передаются им дальше; после отказа порции
+    отбрасываются, а вместо файла в `request.FILES` попадает
+    `RejectedUpload`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is not None:
+            return None
+        if start == 0 and not looks_like_image(raw_data[:12]):
+            self.error = 'Файл не похож на картинку JPEG, PNG, GIF или WebP.'
+            return None
+        self.received += len(raw_data)
+        limit = settings.IMAGE_UPLOAD_MAX_SIZE
+        if self.received > limit:
+            self.error = f'Картинка больше {filesizeformat(limit)}.'
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.error is not None:
+            return RejectedUpload(self.file_name, self.error)
+        return None
+
+
+def png_has_exif(upload):
+    """Ищет чанк eXIf, перескакивая через данные остальных чанков.
+
+    Pillow находит eXIf после данных картинки, только декодировав её
+    целиком, поэтому заголовки чанков читаются напрямую.
+    """
+    upload.seek(8)
+    while True:
+        header = upload.read(8)
+        if len(header) < 8:
+            return False
+        length, kind = struct.unpack('>I4s', header)
+        if kind == b'eXIf':
+            return True
+        if kind == b'IEND':
+            return False
+        upload.seek(length + 4, 1)
+
+
+def has_exif(image, upload):
+    """Есть ли в картинке EXIF; пиксели при этом не декодируются."""
+    if image.format == 'PNG':
+        return 'exif' in image.info or png_has_exif(upload)
+    # У JPEG и WebP EXIF уже прочитан из заголовка в `image.info`.
+    return bool(image.getexif())
+
+
+def normalize_image(upload):
+    """Проверяет размеры картинки и убирает из неё EXIF.
+
+    Картинку без EXIF и не больше IMAGE_MAX_SIDE возвращает без
+    изменений. Иначе поворачивает по EXIF, уменьшает и сохраняет заново
+    без метаданных во временный файл, который при размере больше
+    FILE_UPLOAD_MAX_MEMORY_SIZE уходит на диск.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}×{height} слишком большая.',
+            code='too_many_pixels',
+        )
+    max_side = settings.IMAGE_MAX_SIDE
+    too_big = max(width, height) > max_side
+    if image.format not in REENCODED_FORMATS or not (
+        too_big or has_exif(image, upload)
+    ):
+        upload.seek(0)
+        return upload
+    image_format = image.format
+    if too_big:
+        # Для JPEG декодер сразу уменьшает картинку в 2, 4 или 8 раз.
+        image.draft(image.mode, (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side))
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(
+        output, image_format, exif=b'', quality=settings.IMAGE_QUALITY
+    )
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(
+        output, upload.name, Image.MIME[image_format], size
+    )
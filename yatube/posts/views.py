@@ -1,32 +1,53 @@
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from . import recommendations, trending
+from .autocomplete import suggest
+from .conditional import (
+    group_etag, index_etag, post_detail_etag, profile_etag
+)
+from .counters import user_stats
+from .feeds import FollowFeedPaginator
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .fragments import feed_version
+from .models import Follow, Group, Post, Tag, User
+from .paginators import POSTS_PER_PAGE, CursorPaginator, paginate
+from .search import search_paginator
+from .thumbnails import attach_thumbnails
 
 User = get_user_model()
 
 
+@condition(etag_func=index_etag)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group').order_by(
+        '-pub_date', '-id'
+    )
+    version = feed_version()
+    page_obj = paginate(request, post_list, version=version)
+    attach_thumbnails(page_obj, '600x400')
     context = {
         'page_obj': page_obj,
+        'feed_version': version,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'trending': trending.cached(),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.post_set.select_related('author').order_by(
+        '-pub_date', '-id'
+    )
+    page_obj = paginate(request, posts)
+    attach_thumbnails(page_obj, '600x400')
     template = 'posts/group_list.html'
     context = {
         'group': group,
@@ -35,43 +56,128 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@condition(etag_func=profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = user.posts.select_related('group').order_by('-pub_date', '-id')
+    page_obj = paginate(request, posts)
+    attach_thumbnails(page_obj, '960x339')
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
-            user=request.user
+            user=request.user, author=user
         ).exists()
     context = {
         'author': user,
         'page_obj': page_obj,
-        'post_count': paginator.count,
-        'following': following
+        'post_count': user_stats(user).posts_count,
+        'following': following,
+        'recommendations': recommendations.for_user(
+            request.user, exclude=user
+        ),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = Post.objects.get(pk=post_id)
-    posts_count = Post.objects.filter(author=post.author).count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    posts_count = user_stats(post.author).posts_count
     form = CommentForm()
-    comments_list = post.comments.all()
     context = {
         'post': post,
         'posts_count': posts_count,
         'user_can_edit': request.user == post.author,
         'form': form,
-        'comments': comments_list
+        'comments': comments_page(request, post),
     }
     return render(request, template, context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    paginator = search_paginator(query, POSTS_PER_PAGE)
+    if paginator is not None:
+        page_obj = paginator.cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+        attach_thumbnails(page_obj, '600x400')
+    context = {
+        'search_query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def entries_page(request, entries):
+    """Курсорная страница записей тега или упоминаний."""
+    paginator = CursorPaginator(
+        entries.select_related(
+            'post__author', 'post__group', 'comment__author'
+        ),
+        POSTS_PER_PAGE,
+    )
+    page_obj = paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    attach_thumbnails([entry.post for entry in page_obj], '600x400')
+    return page_obj
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    context = {
+        'tag': tag,
+        'page_obj': entries_page(request, tag.entries.all()),
+    }
+    return render(request, 'posts/tag.html', context)
+
+
+@login_required
+def mentions(request):
+    context = {
+        'page_obj': entries_page(request, request.user.mentions.all()),
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
+def trending_index(request):
+    context = {'trending': trending.cached()}
+    return render(request, 'posts/trending.html', context)
+
+
+def autocomplete(request):
+    return JsonResponse({'results': suggest(request.GET.get('q', ''))})
+
+
+def comments_page(request, post):
+    """Порция комментариев поста после курсора `?after=`."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    )
+    return paginator.cursor_page(after=request.GET.get('after'))
+
+
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments_page.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -117,13 +223,23 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.filter(
+        author__following__user=request.user
+    ).select_related('author', 'group').order_by('-pub_date', '-id')
+    version = feed_version(request.user)
+    page_obj = paginate(
+        request,
+        posts,
+        cursor_paginator=FollowFeedPaginator(request.user, POSTS_PER_PAGE),
+        version=version,
+    )
+    attach_thumbnails(page_obj, '600x400')
     context = {
         'page_obj': page_obj,
-        'posts': posts
+        'posts': posts,
+        'feed_version': version,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'recommendations': recommendations.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -132,9 +248,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = User.objects.get(username=username)
     user = request.user
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    if user != author:
+        Follow.objects.get_or_create(user=user, author=author)
     return redirect('posts:profile', username=author)
 
 
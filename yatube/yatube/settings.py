@@ -45,6 +45,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -135,8 +136,106 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Медиафайлы отдаёт core.media.serve_media. Файлы с хешем в имени
+# кэшируются навсегда, остальные — на MEDIA_CACHE_MAX_AGE секунд.
+MEDIA_CACHE_MAX_AGE = 60 * 60
+MEDIA_BLOCK_SIZE = 64 * 1024
+# 'x-accel-redirect' для nginx или 'x-sendfile' для Apache: тогда файл
+# отправляет веб-сервер, а для nginx нужен internal location с префиксом
+# MEDIA_ACCEL_PREFIX, указывающий в MEDIA_ROOT.
+MEDIA_ACCEL = os.environ.get('YATUBE_MEDIA_ACCEL') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Загрузки проверяются по мере чтения запроса, до записи на диск.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Картинки больше этого по длинной стороне уменьшаются при загрузке.
+IMAGE_MAX_SIDE = 2560
+IMAGE_QUALITY = 90
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Общий для всех воркеров кэш в файле SQLite: YATUBE_CACHE=sqlite.
+if os.environ.get('YATUBE_CACHE') == 'sqlite':
+    CACHES['default'] = {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    }
+
+# Авторы, у которых подписчиков больше этого числа, не раскладывают посты
+# по лентам при публикации: их посты подмешиваются в ленту при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+
+# Сколько последних постов автора попадает в ленту при подписке.
+FEED_BACKFILL_SIZE = 100
+
+FEED_PULL_AUTHORS_TIMEOUT = 60 * 10
+
+# Фрагменты лент сбрасываются по событиям, а срок жизни — лишь страховка.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько комментариев показывать на странице поста и подгружать за раз.
+COMMENTS_PER_PAGE = 20
+
+# Нумерованная пагинация: сколько хранить посчитанное число постов и с
+# какого размера таблицы вместо COUNT(*) брать оценку.
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+PAGINATOR_ESTIMATE_THRESHOLD = 1000000
+
+# Поиск ранжирует не больше стольких самых новых совпадений в постах и
+# столько же в комментариях: оценка BM25 считается для каждого из них.
+SEARCH_MAX_MATCHES = 10000
+
+# Подсказки авторов и групп: сколько отдавать и как часто перестраивать
+# индекс в памяти процесса, чтобы увидеть изменения из других процессов.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REBUILD_INTERVAL = 60 * 5
+
+# Популярное: окно в часах, за сколько часов вес события падает вдвое,
+# сколько объектов показывать и как часто пересчитывать списки.
+TRENDING_WINDOW_HOURS = 48
+TRENDING_HALF_LIFE_HOURS = 6
+TRENDING_TOP = 10
+TRENDING_CACHE_TIMEOUT = 60 * 5
+
+# Рекомендации подписок: сколько кандидатов хранить и показывать и сколько
+# путей в графе подписок обрабатывать за один шаг `build_follow_recs`.
+FOLLOW_RECS_TOP = 20
+FOLLOW_RECS_SHOWN = 5
+FOLLOW_RECS_MAX_PATHS = 2_000_000
+
+# Миниатюры картинок готовит пул потоков после сохранения поста; пока
+# миниатюры нет, страницы показывают заглушку.
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE_TIMEOUT = 60 * 5
+
+# Сколько запросов к базе может выполнить страница (проверяется при DEBUG).
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 5,
+    'posts:profile': 8,
+    'posts:post_detail': 6,
+    'posts:post_comments': 3,
+    'posts:follow_index': 6,
+    'posts:tag': 4,
+    'posts:mentions': 3,
+    'posts:trending': 2,
+}
+
+QUERY_BUDGET_STRICT = False